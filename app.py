@@ -1,4 +1,6 @@
 # -*- coding: utf-8 -*-
+import asyncio
+
 from telegram.ext import (
     ApplicationBuilder,
     CommandHandler,
@@ -7,26 +9,52 @@ from telegram.ext import (
     filters,
 )
 
-from config import TOKEN
-from db import init_db
+from config import TOKEN, BOT_MODE, CONCURRENT_UPDATES, PERSISTENCE_FLUSH_INTERVAL
+from db import init_db, close_pool
+from services.pluses import flush_pluses
 from handlers.start import start
 from handlers.callbacks import callbacks
 from handlers.text import handle_text
 from handlers.logout import logout
+from handlers.top import top
+from maintenance import schedule_maintenance
+from persistence import SQLitePersistence
+from update_processor import PerUserUpdateProcessor
+
+
+async def on_shutdown(app):
+    # Плюсы из очереди записи должны попасть в базу до закрытия пула
+    await flush_pluses()
+    close_pool()
 
 
 def main():
     print("=== TG PLUS BOT STARTED ===")
     init_db()
 
-    app = ApplicationBuilder().token(TOKEN).build()
+    app = (
+        ApplicationBuilder()
+        .token(TOKEN)
+        .concurrent_updates(PerUserUpdateProcessor(CONCURRENT_UPDATES))
+        .persistence(SQLitePersistence(PERSISTENCE_FLUSH_INTERVAL))
+        .post_shutdown(on_shutdown)
+        .build()
+    )
+
+    schedule_maintenance(app.job_queue)
 
     app.add_handler(CommandHandler("start", start))
     app.add_handler(CommandHandler("logout", logout))
+    app.add_handler(CommandHandler("top", top))
     app.add_handler(CallbackQueryHandler(callbacks))
     app.add_handler(MessageHandler(filters.TEXT & ~filters.COMMAND, handle_text))
 
-    app.run_polling()
+    if BOT_MODE == "webhook":
+        # aiohttp is only needed in webhook mode
+        from webhook import run_webhook
+        asyncio.run(run_webhook(app))
+    else:
+        app.run_polling()
 
 
 if __name__ == "__main__":
@@ -0,0 +1,18 @@
+# -*- coding: utf-8 -*-
+"""Shared setup for the benchmarks: a fresh temporary database.
+
+Run a benchmark from the repo root, e.g. `python bench/plus_batching.py`.
+"""
+
+import os
+import sys
+import tempfile
+
+# config читает окружение при импорте: бенчмарки работают с временной базой
+os.environ["DB_PATH"] = os.path.join(tempfile.mkdtemp(), "bench.db")
+os.environ.setdefault("BOT_TOKEN", "bench")
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from db import init_db  # noqa: E402
+
+init_db()
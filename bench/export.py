@@ -0,0 +1,62 @@
+# -*- coding: utf-8 -*-
+"""CSV export of a synthetic million-row pluses table: time and peak memory.
+
+Usage: python bench/export.py [rows]
+"""
+
+import random
+import resource
+import sys
+import time
+
+import common  # noqa: F401
+from db import transaction
+from services.export import export_csv
+
+ROWS = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+USERS = 500
+
+
+def _max_rss_mb() -> float:
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def seed():
+    rng = random.Random(1)
+    with transaction() as conn:
+        conn.executemany("INSERT INTO users (name) VALUES (?)", [(f"User {i}",) for i in range(USERS)])
+        reason_ids = [row[0] for row in conn.execute("SELECT id FROM reasons")]
+        conn.executemany(
+            """
+            INSERT INTO pluses (from_id, to_id, reason_id, reason_text, comment, created_at)
+            VALUES (?, ?, ?, NULL, ?, datetime('2024-01-01', ? || ' seconds'))
+            """,
+            (
+                (rng.randrange(1, USERS + 1), rng.randrange(1, USERS + 1), rng.choice(reason_ids),
+                 "спасибо за помощь" if i % 3 else None, i * 30)
+                for i in range(ROWS)
+            ),
+        )
+
+
+def main():
+    start = time.perf_counter()
+    seed()
+    print(f"seeded {ROWS:,} pluses in {time.perf_counter() - start:.1f} s")
+
+    for label, since, until in (("all", None, None), ("quarter", "2024-04-01", "2024-07-01")):
+        rss_before = _max_rss_mb()
+        start = time.perf_counter()
+        out, count = export_csv("pluses", since, until)
+        elapsed = time.perf_counter() - start
+        out.seek(0, 2)
+        size = out.tell()
+        out.close()
+        print(
+            f"{label:>8}: {count:,} rows, {size / 1e6:.1f} MB CSV in {elapsed:.2f} s, "
+            f"max RSS {rss_before:.0f} -> {_max_rss_mb():.0f} MB"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+# -*- coding: utf-8 -*-
+"""Memory allocated per response for keyboards: built per call vs. shared/cached.
+
+"fresh" rebuilds the same markup on every call, as ui did before the
+static keyboards and the page cache; "shared" is what handlers get now.
+Reports blocks and bytes that each response keeps alive (tracemalloc
+snapshot diff with every result retained) and time per call.
+"""
+
+import time
+import tracemalloc
+
+import common  # noqa: F401
+from services.users import add_user, get_users_page
+from telegram import InlineKeyboardButton, InlineKeyboardMarkup
+from ui import PAGE_SIZE, admin_menu, build_users_pagination, main_menu, users_page_markup
+
+CALLS = 2000
+
+
+def _rebuild(markup: InlineKeyboardMarkup) -> InlineKeyboardMarkup:
+    return InlineKeyboardMarkup([
+        [InlineKeyboardButton(button.text, callback_data=button.callback_data) for button in row]
+        for row in markup.inline_keyboard
+    ])
+
+
+def _fresh_page():
+    page = get_users_page(None, "next", limit=PAGE_SIZE)
+    return build_users_pagination(page, "choose_user", show_back_to_menu=True)
+
+
+CASES = [
+    ("main_menu", lambda: _rebuild(main_menu()), main_menu),
+    ("admin_menu", lambda: _rebuild(admin_menu()), admin_menu),
+    ("users page", _fresh_page, lambda: users_page_markup("choose_user", show_back_to_menu=True)),
+]
+
+
+def measure(func) -> tuple[float, float, float]:
+    func()  # прогрев: кэш страницы, ленивые импорты
+    results = [None] * CALLS
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+    for i in range(CALLS):
+        results[i] = func()
+    after = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+    stats = after.compare_to(before, "filename")
+    blocks = sum(stat.count_diff for stat in stats) / CALLS
+    size = sum(stat.size_diff for stat in stats) / CALLS
+
+    start = time.perf_counter()
+    for _ in range(CALLS):
+        func()
+    return blocks, size, (time.perf_counter() - start) / CALLS * 1e6
+
+
+def main():
+    for i in range(30):
+        add_user(f"User {i:02d}")
+    print(f"{'':12} {'':>7} {'blocks':>8} {'bytes':>8} {'us/call':>8}")
+    for name, fresh, shared in CASES:
+        for label, func in (("fresh", fresh), ("shared", shared)):
+            blocks, size, micros = measure(func)
+            print(f"{name:12} {label:>7} {blocks:8.1f} {size:8.0f} {micros:8.1f}")
+
+
+if __name__ == "__main__":
+    main()
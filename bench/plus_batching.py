@@ -0,0 +1,44 @@
+# -*- coding: utf-8 -*-
+"""Commits per second: write-behind PlusWriteQueue vs. one transaction per plus."""
+
+import asyncio
+import time
+
+import common  # noqa: F401
+from db import get_connection, run_db
+from services.pluses import PlusWriteQueue, save_plus
+from services.users import add_user
+
+PLUSES = 2000
+MAX_ROWS = 50
+MAX_DELAY = 0.05
+
+
+async def per_call(giver: int, receiver: int):
+    await asyncio.gather(*(
+        run_db(save_plus, giver, receiver, "other", "bench", None) for _ in range(PLUSES)
+    ))
+
+
+async def batched(giver: int, receiver: int):
+    queue = PlusWriteQueue(MAX_ROWS, MAX_DELAY)
+    await asyncio.gather(*(
+        queue.submit(giver, receiver, "other", "bench", None) for _ in range(PLUSES)
+    ))
+
+
+def main():
+    giver = add_user("Bench Giver")
+    for name, run in (("per-call", per_call), ("batched", batched)):
+        receiver = add_user(f"Bench {name}")
+        start = time.perf_counter()
+        asyncio.run(run(giver, receiver))
+        elapsed = time.perf_counter() - start
+        with get_connection() as conn:
+            saved = conn.execute("SELECT COUNT(*) FROM pluses WHERE to_id = ?", (receiver,)).fetchone()[0]
+        assert saved == PLUSES, saved
+        print(f"{name:>9}: {PLUSES} pluses in {elapsed:.2f} s, {PLUSES / elapsed:,.0f} pluses/s")
+
+
+if __name__ == "__main__":
+    main()
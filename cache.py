@@ -0,0 +1,91 @@
+# -*- coding: utf-8 -*-
+
+import threading
+import time
+from collections import OrderedDict
+
+# Маркер "значения нет в кэше" — сам None тоже может быть закэширован
+MISSING = object()
+
+
+class TTLCache:
+    """Thread-safe LRU cache whose entries also expire after `ttl` seconds.
+
+    Services keep one instance per kind of data and invalidate entries
+    explicitly from the functions that change that data.
+    """
+
+    def __init__(self, maxsize: int, ttl: float):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._data = OrderedDict()  # key -> (expires_at, value)
+        self._lock = threading.Lock()
+        # Растёт при каждой инвалидации: загрузка, начатая до неё,
+        # не должна положить в кэш устаревшее значение
+        self._generation = 0
+
+    def get(self, key, default=MISSING):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None or entry[0] < time.monotonic():
+                if entry is not None:
+                    del self._data[key]
+                self.misses += 1
+                return default
+            self._data.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def set(self, key, value):
+        with self._lock:
+            self._set(key, value)
+
+    def _set(self, key, value):
+        self._data[key] = (time.monotonic() + self.ttl, value)
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+
+    def get_or_load(self, key, loader):
+        """Return the cached value for `key`, calling `loader()` on a miss."""
+        value = self.get(key)
+        if value is not MISSING:
+            return value
+        generation = self._generation
+        value = loader()
+        with self._lock:
+            if generation == self._generation:
+                self._set(key, value)
+        return value
+
+    def load_many(self, loader) -> int:
+        """Fill the cache from `loader()`, which returns [(key, value), ...].
+
+        Used to pre-warm the cache in bulk; nothing is stored if an
+        invalidation happened while the loader ran. Returns how many
+        entries were stored.
+        """
+        generation = self._generation
+        items = loader()
+        with self._lock:
+            if generation != self._generation:
+                return 0
+            for key, value in items[-self.maxsize:]:
+                self._set(key, value)
+        return min(len(items), self.maxsize)
+
+    def invalidate(self, key):
+        with self._lock:
+            self._generation += 1
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._generation += 1
+            self._data.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses, "size": len(self._data)}
@@ -5,5 +5,68 @@ import os
 DB_PATH = os.getenv("DB_PATH", "data.db")
 TOKEN = os.getenv("BOT_TOKEN")
 
+# Number of SQLite connections kept open and shared by all services
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "5"))
+# How long (seconds) SQLite waits for a lock held by another writer
+DB_BUSY_TIMEOUT = float(os.getenv("DB_BUSY_TIMEOUT", "5"))
+
+# Per-connection SQLite tuning (see https://www.sqlite.org/pragma.html)
+DB_SYNCHRONOUS = os.getenv("DB_SYNCHRONOUS", "NORMAL")
+DB_CACHE_SIZE = int(os.getenv("DB_CACHE_SIZE", "-16000"))  # отрицательное — в KiB
+DB_MMAP_SIZE = int(os.getenv("DB_MMAP_SIZE", str(64 * 1024 * 1024)))
+DB_TEMP_STORE = os.getenv("DB_TEMP_STORE", "MEMORY")
+
+# In-process caches (users, bindings, ...): max entries and lifetime in seconds
+CACHE_MAXSIZE = int(os.getenv("CACHE_MAXSIZE", "10000"))
+CACHE_TTL = float(os.getenv("CACHE_TTL", "300"))
+
+# How many updates are handled at once across different users (updates of
+# one user are always processed in order, one at a time)
+CONCURRENT_UPDATES = int(os.getenv("CONCURRENT_UPDATES", "16"))
+
+# Write-behind batching of pluses: off by default; when on, pluses are
+# committed together every PLUS_BATCH_MAX_ROWS rows or PLUS_BATCH_MAX_DELAY_MS
+PLUS_BATCH_ENABLED = os.getenv("PLUS_BATCH_ENABLED", "0") == "1"
+PLUS_BATCH_MAX_ROWS = int(os.getenv("PLUS_BATCH_MAX_ROWS", "50"))
+PLUS_BATCH_MAX_DELAY_MS = int(os.getenv("PLUS_BATCH_MAX_DELAY_MS", "50"))
+
+# How often (seconds) changed context.user_data is written to the database
+PERSISTENCE_FLUSH_INTERVAL = float(os.getenv("PERSISTENCE_FLUSH_INTERVAL", "5"))
+
+# How often (seconds) new pluses are folded into the analytics rollups
+ROLLUP_INTERVAL = float(os.getenv("ROLLUP_INTERVAL", "600"))
+
+# Background database maintenance, intervals in seconds (0 disables a job):
+# PRAGMA optimize, WAL checkpoint and incremental vacuum
+OPTIMIZE_INTERVAL = float(os.getenv("OPTIMIZE_INTERVAL", "3600"))
+CHECKPOINT_INTERVAL = float(os.getenv("CHECKPOINT_INTERVAL", "300"))
+CHECKPOINT_MODE = os.getenv("CHECKPOINT_MODE", "PASSIVE")
+VACUUM_INTERVAL = float(os.getenv("VACUUM_INTERVAL", "86400"))
+# Rows sampled per index by PRAGMA optimize; pages freed per vacuum run (0 = all)
+DB_ANALYSIS_LIMIT = int(os.getenv("DB_ANALYSIS_LIMIT", "1000"))
+DB_VACUUM_PAGES = int(os.getenv("DB_VACUUM_PAGES", "2000"))
+# Pre-load users, catalog, balances and the search index right after startup
+CACHE_WARMUP = os.getenv("CACHE_WARMUP", "1") == "1"
+
+# How updates are received: "polling" (default) or "webhook"
+BOT_MODE = os.getenv("BOT_MODE", "polling")
+# Webhook mode: public base URL Telegram posts to (set_webhook is skipped if
+# empty, e.g. when a proxy registers it), local listen address and path, and
+# the secret Telegram echoes in X-Telegram-Bot-Api-Secret-Token
+WEBHOOK_URL = os.getenv("WEBHOOK_URL", "")
+WEBHOOK_LISTEN = os.getenv("WEBHOOK_LISTEN", "0.0.0.0")
+WEBHOOK_PORT = int(os.getenv("WEBHOOK_PORT", "8080"))
+WEBHOOK_PATH = os.getenv("WEBHOOK_PATH", "telegram")
+WEBHOOK_SECRET = os.getenv("WEBHOOK_SECRET", "")
+
 if not TOKEN:
     raise RuntimeError("BOT_TOKEN is not set")
+
+if CHECKPOINT_MODE not in ("PASSIVE", "FULL", "RESTART", "TRUNCATE"):
+    raise RuntimeError(f"Unknown CHECKPOINT_MODE: {CHECKPOINT_MODE}")
+
+if BOT_MODE not in ("polling", "webhook"):
+    raise RuntimeError(f"Unknown BOT_MODE: {BOT_MODE}")
+
+if BOT_MODE == "webhook" and not WEBHOOK_SECRET:
+    raise RuntimeError("WEBHOOK_SECRET is not set")
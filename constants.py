@@ -12,3 +12,22 @@ REASONS = {
     "pr": "PR и продвижение МЛА+",
     "other": "Другое",
 }
+
+_REASON_KEYS = {text: key for key, text in REASONS.items()}
+
+
+def reason_key(reason: str) -> str:
+    """Key of REASONS for a stored reason text; free-text "Другое: ..." maps to "other"."""
+    return _REASON_KEYS.get(reason, "other")
+
+
+# Custom emoji shown in place of ➕ on the "my status" screen
+PLUS_EMOJI_ID = "5458840666563970188"
+
+# Default seed catalog used on first run (key -> (name, price, stock_limit))
+DEFAULT_CATALOG = {
+    "stickerpack": ("Новогодний стикерпак", 3, None),
+    "big_sticker": ("Объёмный новогодний стикер", 1, None),
+    "mug": ("Новогодняя термокружка", 10, 25),
+    "pots": ("Набор горшков для зеленых друзей", 8, None),
+}
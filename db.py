@@ -1,13 +1,145 @@
 # -*- coding: utf-8 -*-
 
+import asyncio
+import functools
+import queue
 import sqlite3
-from config import DB_PATH
+import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
 
+from constants import DEFAULT_CATALOG, REASONS, reason_key
+from config import (
+    DB_PATH,
+    DB_ANALYSIS_LIMIT,
+    DB_VACUUM_PAGES,
+    DB_POOL_SIZE,
+    DB_BUSY_TIMEOUT,
+    DB_SYNCHRONOUS,
+    DB_CACHE_SIZE,
+    DB_MMAP_SIZE,
+    DB_TEMP_STORE,
+)
 
-def init_db():
-    conn = sqlite3.connect(DB_PATH)
-    c = conn.cursor()
 
+# ===== Пул соединений =====
+# Соединения открываются лениво (не больше DB_POOL_SIZE) и живут всё время
+# работы бота. Сервисы берут соединение через get_connection()/transaction()
+# и возвращают его обратно в пул.
+
+_pool: queue.LifoQueue = queue.LifoQueue(maxsize=DB_POOL_SIZE)
+_pool_lock = threading.Lock()
+_opened = 0
+
+
+def _connect() -> sqlite3.Connection:
+    """Open a new connection and apply per-connection pragmas once."""
+    conn = sqlite3.connect(
+        DB_PATH,
+        timeout=DB_BUSY_TIMEOUT,
+        check_same_thread=False,
+    )
+    conn.execute(f"PRAGMA busy_timeout = {int(DB_BUSY_TIMEOUT * 1000)}")
+    conn.execute(f"PRAGMA synchronous = {DB_SYNCHRONOUS}")
+    conn.execute(f"PRAGMA cache_size = {DB_CACHE_SIZE}")
+    conn.execute(f"PRAGMA mmap_size = {DB_MMAP_SIZE}")
+    conn.execute(f"PRAGMA temp_store = {DB_TEMP_STORE}")
+    return conn
+
+
+def _acquire() -> sqlite3.Connection:
+    global _opened
+    try:
+        return _pool.get_nowait()
+    except queue.Empty:
+        pass
+
+    with _pool_lock:
+        if _opened < DB_POOL_SIZE:
+            _opened += 1
+            try:
+                return _connect()
+            except Exception:
+                _opened -= 1
+                raise
+
+    # Пул исчерпан — ждём, пока кто-нибудь вернёт соединение
+    return _pool.get()
+
+
+def _release(conn: sqlite3.Connection):
+    if conn.in_transaction:
+        conn.rollback()
+    _pool.put_nowait(conn)
+
+
+@contextmanager
+def get_connection():
+    """Borrow a pooled connection for reads.
+
+    Any transaction left open by the caller is rolled back on return.
+    """
+    conn = _acquire()
+    try:
+        yield conn
+    finally:
+        _release(conn)
+
+
+@contextmanager
+def transaction(immediate: bool = False):
+    """Borrow a pooled connection and run the block in one transaction.
+
+    Commits on success, rolls back if the block raises. With
+    `immediate=True` the write lock is taken up front (BEGIN IMMEDIATE),
+    so reads inside the block can't be invalidated by another writer.
+    """
+    conn = _acquire()
+    try:
+        with conn:
+            if immediate:
+                conn.execute("BEGIN IMMEDIATE")
+            yield conn
+    finally:
+        _release(conn)
+
+
+# ===== Асинхронный доступ =====
+# Все вызовы sqlite3 блокирующие, поэтому хендлеры выполняют их через run_db
+# на отдельном пуле потоков, а не в event loop. Потоков столько же, сколько
+# соединений в пуле, чтобы поток никогда не ждал свободного соединения.
+
+_executor = ThreadPoolExecutor(max_workers=DB_POOL_SIZE, thread_name_prefix="db")
+
+
+async def run_db(func, *args, **kwargs):
+    """Run a blocking service call on the DB thread pool and await its result."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_executor, functools.partial(func, *args, **kwargs))
+
+
+def close_pool():
+    """Stop the DB thread pool and close every pooled connection (on shutdown)."""
+    global _opened
+    _executor.shutdown(wait=True)
+    with _pool_lock:
+        while True:
+            try:
+                conn = _pool.get_nowait()
+            except queue.Empty:
+                break
+            conn.close()
+            _opened -= 1
+
+
+# ===== Миграции схемы =====
+# Каждая миграция выполняется ровно один раз, в своей транзакции; номер
+# применённой миграции записывается в schema_version. Новые изменения схемы
+# добавляются в конец MIGRATIONS со следующим номером.
+
+
+def _migration_base_schema(c: sqlite3.Cursor):
     c.execute("""
         CREATE TABLE IF NOT EXISTS users (
             id INTEGER PRIMARY KEY AUTOINCREMENT,
@@ -16,7 +148,7 @@ def init_db():
         )
     """)
 
-    # Ensure existing installations get the new column when upgrading
+    # Installations created before schema versioning may lack this column
     c.execute("PRAGMA table_info(users)")
     cols = [row[1] for row in c.fetchall()]
     if "is_admin" not in cols:
@@ -62,5 +194,420 @@ def init_db():
         )
     """)
 
-    conn.commit()
-    conn.close()
+
+def _migration_hot_path_indexes(c: sqlite3.Cursor):
+    # Баланс и экран "Мой статус": COUNT по to_id, список по to_id + created_at
+    c.execute("CREATE INDEX IF NOT EXISTS idx_pluses_to_id ON pluses (to_id, created_at)")
+    # "Моя история": pluses WHERE from_id ORDER BY created_at
+    c.execute("CREATE INDEX IF NOT EXISTS idx_pluses_from_id ON pluses (from_id, created_at)")
+    # Баланс (SUM(price)) и "Мои покупки" — price входит в индекс, чтобы
+    # сумма считалась без обращения к таблице
+    c.execute(
+        "CREATE INDEX IF NOT EXISTS idx_purchases_user_id ON purchases (user_id, created_at, price)"
+    )
+    # Остаток товара: COUNT(*) WHERE item_key
+    c.execute("CREATE INDEX IF NOT EXISTS idx_purchases_item_key ON purchases (item_key)")
+
+
+def _rebuild_balances(c: sqlite3.Cursor):
+    c.execute("DELETE FROM balances")
+    c.execute("""
+        INSERT INTO balances (user_id, received, spent)
+        SELECT user_id, SUM(received), SUM(spent)
+        FROM (
+            SELECT to_id AS user_id, COUNT(*) AS received, 0 AS spent
+            FROM pluses GROUP BY to_id
+            UNION ALL
+            SELECT user_id, 0, SUM(price)
+            FROM purchases GROUP BY user_id
+        )
+        GROUP BY user_id
+    """)
+
+
+def _migration_balances(c: sqlite3.Cursor):
+    # Материализованный баланс: обновляется в той же транзакции, что и
+    # save_plus / buy_item, и всегда может быть пересчитан из истории
+    c.execute("""
+        CREATE TABLE IF NOT EXISTS balances (
+            user_id INTEGER PRIMARY KEY,
+            received INTEGER NOT NULL DEFAULT 0,
+            spent INTEGER NOT NULL DEFAULT 0
+        )
+    """)
+    _rebuild_balances(c)
+
+
+def _migration_shop_sold_count(c: sqlite3.Cursor):
+    # Счётчик проданного хранится рядом с лимитом, чтобы покупка проверяла
+    # и списывала остаток одной строкой, а не COUNT(*) по purchases
+    c.execute("ALTER TABLE shop_items ADD COLUMN sold_count INTEGER NOT NULL DEFAULT 0")
+    c.execute("""
+        UPDATE shop_items SET sold_count = (
+            SELECT COUNT(*) FROM purchases WHERE purchases.item_key = shop_items.item_key
+        )
+    """)
+
+
+def _migration_seed_catalog(c: sqlite3.Cursor):
+    # Раньше магазин засевался проверкой COUNT(*) в начале каждой функции
+    # services.shop; теперь — один раз при инициализации базы
+    c.execute("SELECT COUNT(*) FROM shop_items")
+    if c.fetchone()[0]:
+        return
+    c.executemany(
+        "INSERT OR IGNORE INTO shop_items (item_key, item_name, price, stock_limit) VALUES (?, ?, ?, ?)",
+        [(key, name, price, limit) for key, (name, price, limit) in DEFAULT_CATALOG.items()],
+    )
+
+
+def _migration_users_name_index(c: sqlite3.Cursor):
+    # Keyset-пагинация списков пользователей по (name, id)
+    c.execute("CREATE INDEX IF NOT EXISTS idx_users_name_id ON users (name, id)")
+
+
+def _migration_user_data(c: sqlite3.Cursor):
+    # context.user_data по telegram_id (незавершённые сценарии, internal_id),
+    # см. persistence.SQLitePersistence
+    c.execute("""
+        CREATE TABLE IF NOT EXISTS user_data (
+            user_id INTEGER PRIMARY KEY,
+            data TEXT NOT NULL,
+            updated_at DATETIME DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+
+
+def _migration_history_indexes(c: sqlite3.Cursor):
+    # Админские ленты "Все плюсики" / "Все покупки": keyset по (created_at, id)
+    c.execute("CREATE INDEX IF NOT EXISTS idx_pluses_created_id ON pluses (created_at, id)")
+    c.execute("CREATE INDEX IF NOT EXISTS idx_purchases_created_id ON purchases (created_at, id)")
+
+
+def _count_pluses_by_reason_text(c: sqlite3.Cursor):
+    # Схема до миграции 10: причина хранится текстом, поэтому ключ причины
+    # считается в Python по уже сгруппированным строкам
+    c.execute("""
+        SELECT strftime('%Y-%m', created_at), reason, to_id, COUNT(*)
+        FROM pluses
+        GROUP BY 1, 2, 3
+    """)
+    counters = {}
+    for month, reason, user_id, count in c.fetchall():
+        key = (month, reason_key(reason), user_id)
+        counters[key] = counters.get(key, 0) + count
+    c.executemany(
+        "INSERT INTO plus_counters (month, reason_key, user_id, count) VALUES (?, ?, ?, ?)",
+        [(*key, count) for key, count in counters.items()],
+    )
+    c.execute("""
+        INSERT INTO plus_month_totals (month, user_id, count)
+        SELECT month, user_id, SUM(count) FROM plus_counters GROUP BY month, user_id
+    """)
+
+
+def _rebuild_plus_counters(c: sqlite3.Cursor):
+    c.execute("DELETE FROM plus_counters")
+    c.execute("DELETE FROM plus_month_totals")
+    c.execute("""
+        INSERT INTO plus_counters (month, reason_key, user_id, count)
+        SELECT strftime('%Y-%m', p.created_at), r.key, p.to_id, COUNT(*)
+        FROM pluses p
+        JOIN reasons r ON r.id = p.reason_id
+        GROUP BY 1, 2, 3
+    """)
+    c.execute("""
+        INSERT INTO plus_month_totals (month, user_id, count)
+        SELECT month, user_id, SUM(count) FROM plus_counters GROUP BY month, user_id
+    """)
+
+
+def _migration_leaderboard(c: sqlite3.Cursor):
+    # Счётчики для топа: обновляются в save_plus в той же транзакции, что и
+    # сам плюсик, и всегда могут быть пересчитаны из pluses
+    c.execute("""
+        CREATE TABLE IF NOT EXISTS plus_counters (
+            month TEXT NOT NULL,
+            reason_key TEXT NOT NULL,
+            user_id INTEGER NOT NULL,
+            count INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (month, reason_key, user_id)
+        )
+    """)
+    c.execute("""
+        CREATE TABLE IF NOT EXISTS plus_month_totals (
+            month TEXT NOT NULL,
+            user_id INTEGER NOT NULL,
+            count INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (month, user_id)
+        )
+    """)
+    # Топ-N за месяц (по причине) — чтение по индексу без сортировки
+    c.execute(
+        "CREATE INDEX IF NOT EXISTS idx_plus_counters_top ON plus_counters (month, reason_key, count DESC, user_id)"
+    )
+    c.execute(
+        "CREATE INDEX IF NOT EXISTS idx_plus_month_totals_top ON plus_month_totals (month, count DESC, user_id)"
+    )
+    _count_pluses_by_reason_text(c)
+
+
+def _sync_reasons(c: sqlite3.Cursor):
+    # Справочник повторяет constants.REASONS: новые причины добавляются,
+    # переименованные получают новое название, id существующих не меняются
+    c.executemany(
+        "INSERT INTO reasons (key, title) VALUES (?, ?) ON CONFLICT(key) DO UPDATE SET title = excluded.title",
+        list(REASONS.items()),
+    )
+
+
+def _migration_reason_codes(c: sqlite3.Cursor):
+    # Причина плюсика — ссылка на справочник reasons вместо полного текста;
+    # текст для показа хранится только у "Другое" (reason_text)
+    c.execute("""
+        CREATE TABLE reasons (
+            id INTEGER PRIMARY KEY,
+            key TEXT NOT NULL UNIQUE,
+            title TEXT NOT NULL
+        )
+    """)
+    _sync_reasons(c)
+
+    c.execute("""
+        CREATE TABLE pluses_new (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            from_id INTEGER NOT NULL,
+            to_id INTEGER NOT NULL,
+            reason_id INTEGER NOT NULL REFERENCES reasons(id),
+            reason_text TEXT,
+            comment TEXT,
+            created_at DATETIME DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+    # Текст, совпавший с названием причины, становится её кодом. Остальное —
+    # "Другое" с исходным текстом в reason_text, который и показывается:
+    # и "Другое: <текст>", и свободный текст из старых версий бота без префикса
+    c.execute("""
+        INSERT INTO pluses_new (id, from_id, to_id, reason_id, reason_text, comment, created_at)
+        SELECT
+            p.id, p.from_id, p.to_id,
+            COALESCE(r.id, (SELECT id FROM reasons WHERE key = 'other')),
+            CASE WHEN r.id IS NULL THEN p.reason END,
+            p.comment, p.created_at
+        FROM pluses p
+        LEFT JOIN reasons r ON r.title = p.reason
+    """)
+
+    # id не должны переиспользоваться (курсоры страниц, водяной знак свёрток)
+    c.execute("SELECT seq FROM sqlite_sequence WHERE name = 'pluses'")
+    row = c.fetchone()
+    c.execute("DROP TABLE pluses")
+    c.execute("ALTER TABLE pluses_new RENAME TO pluses")
+    if row:
+        c.execute("UPDATE sqlite_sequence SET seq = MAX(seq, ?) WHERE name = 'pluses'", (row[0],))
+
+    c.execute("CREATE INDEX idx_pluses_to_id ON pluses (to_id, created_at)")
+    c.execute("CREATE INDEX idx_pluses_from_id ON pluses (from_id, created_at)")
+    c.execute("CREATE INDEX idx_pluses_created_id ON pluses (created_at, id)")
+
+
+def _roll_up_pluses(c: sqlite3.Cursor) -> int:
+    """Add pluses past the watermark to the daily/weekly rollups; return how many."""
+    c.execute("SELECT last_id FROM rollup_watermarks WHERE name = 'pluses'")
+    last_id = c.fetchone()[0]
+    c.execute("SELECT MAX(id), COUNT(*) FROM pluses WHERE id > ?", (last_id,))
+    max_id, count = c.fetchone()
+    if not count:
+        return 0
+
+    c.execute("""
+        INSERT INTO plus_daily (day, reason_id, count)
+        SELECT date(created_at), reason_id, COUNT(*)
+        FROM pluses WHERE id > ? AND id <= ?
+        GROUP BY 1, 2
+        ON CONFLICT(day, reason_id) DO UPDATE SET count = count + excluded.count
+    """, (last_id, max_id))
+    # Неделя — дата её понедельника
+    c.execute("""
+        INSERT INTO plus_weekly (week, reason_id, count)
+        SELECT date(created_at, 'weekday 0', '-6 days'), reason_id, COUNT(*)
+        FROM pluses WHERE id > ? AND id <= ?
+        GROUP BY 1, 2
+        ON CONFLICT(week, reason_id) DO UPDATE SET count = count + excluded.count
+    """, (last_id, max_id))
+    c.execute("UPDATE rollup_watermarks SET last_id = ? WHERE name = 'pluses'", (max_id,))
+    return count
+
+
+def _migration_rollups(c: sqlite3.Cursor):
+    # Свёртки для аналитики: плюсики по причинам за день и за неделю.
+    # Заполняются фоновой задачей по водяному знаку (последний учтённый id)
+    c.execute("""
+        CREATE TABLE IF NOT EXISTS plus_daily (
+            day TEXT NOT NULL,
+            reason_id INTEGER NOT NULL,
+            count INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (day, reason_id)
+        )
+    """)
+    c.execute("""
+        CREATE TABLE IF NOT EXISTS plus_weekly (
+            week TEXT NOT NULL,
+            reason_id INTEGER NOT NULL,
+            count INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (week, reason_id)
+        )
+    """)
+    c.execute("""
+        CREATE TABLE IF NOT EXISTS rollup_watermarks (
+            name TEXT PRIMARY KEY,
+            last_id INTEGER NOT NULL
+        )
+    """)
+    c.execute("INSERT OR IGNORE INTO rollup_watermarks (name, last_id) VALUES ('pluses', 0)")
+    _roll_up_pluses(c)
+
+
+MIGRATIONS = [
+    (1, _migration_base_schema),
+    (2, _migration_hot_path_indexes),
+    (3, _migration_balances),
+    (4, _migration_shop_sold_count),
+    (5, _migration_seed_catalog),
+    (6, _migration_users_name_index),
+    (7, _migration_user_data),
+    (8, _migration_history_indexes),
+    (9, _migration_leaderboard),
+    (10, _migration_reason_codes),
+    (11, _migration_rollups),
+]
+
+
+def _enable_incremental_vacuum(conn: sqlite3.Connection):
+    # auto_vacuum можно включить у существующей базы только через полный
+    # VACUUM (вне транзакции) — делается один раз, дальше место возвращает
+    # incremental_vacuum()
+    if conn.execute("PRAGMA auto_vacuum").fetchone()[0] == 2:
+        return
+    conn.execute("PRAGMA auto_vacuum = INCREMENTAL")
+    conn.execute("VACUUM")
+    print("DB switched to auto_vacuum = INCREMENTAL")
+
+
+def init_db():
+    """Switch the database to WAL, apply pending schema migrations and sync reasons."""
+    with get_connection() as conn:
+        # journal_mode is persistent and can't be changed inside a transaction
+        conn.execute("PRAGMA journal_mode = WAL")
+        _enable_incremental_vacuum(conn)
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS schema_version (
+                version INTEGER PRIMARY KEY,
+                applied_at DATETIME DEFAULT CURRENT_TIMESTAMP
+            )
+        """)
+
+    for version, migrate in MIGRATIONS:
+        with transaction(immediate=True) as conn:
+            c = conn.cursor()
+            c.execute("SELECT 1 FROM schema_version WHERE version = ?", (version,))
+            if c.fetchone():
+                continue
+            migrate(c)
+            c.execute("INSERT INTO schema_version (version) VALUES (?)", (version,))
+            print(f"DB migration {version} ({migrate.__name__}) applied")
+
+    with transaction(immediate=True) as conn:
+        _sync_reasons(conn.cursor())
+
+
+def rebuild_balances():
+    """Recompute the balances ledger from the full pluses/purchases history."""
+    with transaction(immediate=True) as conn:
+        _rebuild_balances(conn.cursor())
+
+
+def rebuild_leaderboard():
+    """Recompute the leaderboard counters from the full pluses history."""
+    with transaction(immediate=True) as conn:
+        _rebuild_plus_counters(conn.cursor())
+
+
+def roll_up_pluses() -> int:
+    """Fold pluses saved since the last run into the analytics rollups."""
+    with transaction(immediate=True) as conn:
+        return _roll_up_pluses(conn.cursor())
+
+
+def rebuild_rollups():
+    """Recompute the analytics rollups from the full pluses history."""
+    with transaction(immediate=True) as conn:
+        c = conn.cursor()
+        c.execute("DELETE FROM plus_daily")
+        c.execute("DELETE FROM plus_weekly")
+        c.execute("UPDATE rollup_watermarks SET last_id = 0 WHERE name = 'pluses'")
+        _roll_up_pluses(c)
+
+
+# ===== Периодическое обслуживание =====
+# Вызываются фоновыми задачами (maintenance.py) и из командной строки
+
+
+def optimize():
+    """Refresh planner statistics where they are stale (PRAGMA optimize)."""
+    with get_connection() as conn:
+        # analysis_limit ограничивает ANALYZE выборкой строк, чтобы он не
+        # сканировал большие таблицы целиком
+        conn.execute(f"PRAGMA analysis_limit = {DB_ANALYSIS_LIMIT}")
+        conn.execute("PRAGMA optimize")
+
+
+def analyze():
+    """Recompute planner statistics for every table and index."""
+    with get_connection() as conn:
+        conn.execute("PRAGMA analysis_limit = 0")
+        conn.execute("ANALYZE")
+
+
+def checkpoint_wal(mode: str = "PASSIVE") -> tuple[int, int, int]:
+    """Copy the WAL back into the database file.
+
+    Returns (busy, wal_frames, checkpointed_frames) as reported by SQLite.
+    PASSIVE never waits for readers or writers; TRUNCATE also shrinks the
+    WAL file but may wait up to the busy timeout.
+    """
+    with get_connection() as conn:
+        return conn.execute(f"PRAGMA wal_checkpoint({mode})").fetchone()
+
+
+def incremental_vacuum(pages: int = DB_VACUUM_PAGES) -> int:
+    """Return up to `pages` free pages (0 = all) to the OS; return how many."""
+    with get_connection() as conn:
+        before = conn.execute("PRAGMA freelist_count").fetchone()[0]
+        # Прагма освобождает по странице за шаг, а execute() делает только
+        # первый шаг; executescript() выполняет её до конца
+        conn.executescript(f"PRAGMA incremental_vacuum({int(pages)})")
+        after = conn.execute("PRAGMA freelist_count").fetchone()[0]
+    return before - after
+
+
+# ===== Обслуживание из командной строки: python db.py <command> =====
+
+COMMANDS = {
+    "migrate": init_db,
+    "rebuild-balances": rebuild_balances,
+    "rebuild-leaderboard": rebuild_leaderboard,
+    "rebuild-rollups": rebuild_rollups,
+    "analyze": analyze,
+    "checkpoint": lambda: print(checkpoint_wal("TRUNCATE")),
+    "vacuum": lambda: print(f"{incremental_vacuum(0)} pages freed"),
+}
+
+
+if __name__ == "__main__":
+    if len(sys.argv) != 2 or sys.argv[1] not in COMMANDS:
+        print(f"Usage: python db.py {{{'|'.join(COMMANDS)}}}")
+        sys.exit(1)
+    init_db()  # the ledger and counter tables must exist before any rebuild
+    COMMANDS[sys.argv[1]]()
+    print("OK")
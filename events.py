@@ -0,0 +1,42 @@
+# -*- coding: utf-8 -*-
+
+import threading
+from collections import defaultdict
+
+# Плюсик записан: plus_given(from_id=..., to_id=...)
+PLUS_GIVEN = "plus_given"
+# Покупка записана: purchase_made(user_id=..., item_key=...)
+PURCHASE_MADE = "purchase_made"
+
+_subscribers = defaultdict(list)
+_lock = threading.Lock()
+
+
+def subscribe(event: str, handler):
+    """Call `handler(**payload)` every time `event` is published."""
+    with _lock:
+        _subscribers[event].append(handler)
+
+
+def on(event: str):
+    """Decorator form of subscribe()."""
+    def decorator(handler):
+        subscribe(event, handler)
+        return handler
+    return decorator
+
+
+def publish(event: str, **payload):
+    """Notify subscribers synchronously, in the publishing thread.
+
+    Services publish after their transaction has committed, so a
+    subscriber failing must not turn a saved write into an error for the
+    user; it is reported and the remaining subscribers still run.
+    """
+    with _lock:
+        handlers = list(_subscribers[event])
+    for handler in handlers:
+        try:
+            handler(**payload)
+        except Exception as e:
+            print(f"{event} subscriber {handler.__qualname__} failed: {e}")
@@ -1,734 +1,715 @@
 # -*- coding: utf-8 -*-
 
-import sqlite3
+from datetime import date
+
 from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup, MessageEntity
+from telegram.error import BadRequest
 from telegram.ext import ContextTypes
 
-from config import DB_PATH
-from constants import REASONS
-from ui import main_menu, admin_menu, reasons_keyboard, build_users_pagination
+from db import run_db
+from constants import REASONS, PLUS_EMOJI_ID
+from ui import (
+    main_menu,
+    admin_menu,
+    reasons_keyboard,
+    comment_keyboard,
+    back_keyboard,
+    users_page_markup,
+    build_history_pagination,
+    build_cursor_pagination,
+    PAGE_SIZE,
+)
 from services.bindings import (
     get_binding_by_telegram_id,
     create_binding,
 )
-from services.pluses import save_plus, get_pluses_given_by_user, get_recent_pluses
-from services.users import get_user_name, get_all_users, is_admin, add_user, user_exists
+from services.pluses import (
+    submit_plus,
+    get_pluses_given_by_user,
+    get_pluses_page,
+)
+from services.users import get_user_name, is_admin, add_user, user_exists, delete_user
 from services.auth import get_or_restore_internal_id
+from services.export import PERIODS, export_csv, period_bounds
+from services.status import get_status_page
+from services.leaderboard import current_month
+from services.analytics import get_reason_trends, sparkline
+from handlers.router import CallbackRouter, admin_only
+from handlers.top import parse_top_args, render_top
+from rendering import send_long_message
 from services.shop import (
     get_catalog,
+    get_catalog_snapshot,
     get_balance,
     buy_item,
     get_user_purchases,
-    get_remaining_stock,
-    is_in_stock,
-    get_all_items,
     add_item,
     remove_item,
-    get_recent_purchases,
+    get_purchases_page,
 )
 
 
-entities = []
-current_offset = 0
+router = CallbackRouter()
 
 
-def _utf16_len(s: str) -> int:
-    """Return length in UTF-16 code units for Telegram entity offsets."""
-    return len(s.encode("utf-16-le")) // 2
+def _cursor(direction: str):
+    """Route parser for keyset page buttons: `<action>:next:ID` / `<action>:prev:ID`."""
+    return lambda arg: (direction, int(arg))
 
 
-async def send_long_message(message, text: str, reply_markup=None, entities=None, chunk_size: int = 4000):
-    """Send `text` in chunks to avoid Telegram 'Message is too long' errors.
+def _legacy_page(arg: str):
+    """Old `<action>:page:N` buttons (offset pages) restart from the first page."""
+    int(arg)
+    return "next", None
 
-    - `message` is a `telegram.Message` (we call its `reply_text`).
-    - `reply_markup` is attached only to the last chunk.
-    - `entities` are attached only to the first chunk (if provided).
-    """
-    if not text:
-        return
-    start = 0
-    length = len(text)
-    first = True
-    while start < length:
-        end = min(start + chunk_size, length)
-        chunk = text[start:end]
-        # attach entities to first chunk only
-        if first:
-            await message.reply_text(chunk, reply_markup=(reply_markup if end >= length else None), entities=entities)
-            first = False
-        else:
-            await message.reply_text(chunk, reply_markup=(reply_markup if end >= length else None))
-        start = end
+
+# Кнопки списков пользователей, в которых текстовое сообщение — поиск по имени
+_USER_PICKER_ACTIONS = ("choose_user", "delete_user")
 
 
 async def callbacks(update: Update, context: ContextTypes.DEFAULT_TYPE):
     query = update.callback_query
     await query.answer()
-    data = query.data
-    tg_id = query.from_user.id
-
-    # ========= BACK =========
-    if data == "back":
-        # Очищаем все флаги ожидания ввода
-        context.user_data.pop("awaiting_new_user_name", None)
-        context.user_data.pop("awaiting_new_item", None)
-        context.user_data.pop("awaiting_comment_text", None)
-        context.user_data.pop("awaiting_custom_reason", None)
-        
-        internal_id = get_or_restore_internal_id(context, tg_id)
-        if internal_id is not None and is_admin(internal_id):
-            menu = admin_menu()
-        else:
-            menu = main_menu()
-        await query.message.reply_text("Главное меню:", reply_markup=menu)
-        return
-
-    # ========= SELECT SELF (with pagination support) =========
-    if data.startswith("select_self:"):
-        parts = data.split(":")
-
-        # pagination: select_self:page:N
-        if len(parts) >= 3 and parts[1] == "page":
-            try:
-                page = int(parts[2])
-            except ValueError:
-                await query.message.reply_text("Неверный номер страницы.")
-                return
-            users = get_all_users()
-            await query.message.edit_reply_markup(
-                reply_markup=build_users_pagination(
-                    users=users, page=page, action="select_self", show_back_to_menu=False
-                )
-            )
-            return
-
-        # new format: select_self:user:ID
-        if len(parts) >= 3 and parts[1] == "user":
-            try:
-                user_id = int(parts[2])
-            except ValueError:
-                await query.message.reply_text("Неверный пользователь.")
-                return
-        else:
-            # legacy format: select_self:ID
-            try:
-                user_id = int(parts[1])
-            except (IndexError, ValueError):
-                await query.message.reply_text("Неверный пользователь.")
-                return
+    # Поиск по имени действует, только пока пользователь листает выбор;
+    # любая другая кнопка (в том числе из старых сообщений) его выключает
+    if (query.data or "").partition(":")[0] not in _USER_PICKER_ACTIONS:
+        context.user_data.pop("user_search", None)
+    await router.dispatch(update, context)
 
-        context.user_data["pending_self_id"] = user_id
-        name = get_user_name(user_id)
 
-        keyboard = [
-            [InlineKeyboardButton("✅ Да, это я", callback_data="confirm_self")],
-            [InlineKeyboardButton("❌ Нет, вернуться", callback_data="cancel_self")],
-        ]
+# ========= BACK =========
+@router.route("back")
+async def back(update: Update, context: ContextTypes.DEFAULT_TYPE, arg):
+    query = update.callback_query
+    # Очищаем все флаги ожидания ввода
+    context.user_data.pop("awaiting_new_user_name", None)
+    context.user_data.pop("awaiting_new_item", None)
+    context.user_data.pop("awaiting_comment_text", None)
+    context.user_data.pop("awaiting_custom_reason", None)
+    context.user_data.pop("user_search", None)
+
+    internal_id = await get_or_restore_internal_id(context, query.from_user.id)
+    if internal_id is not None and await run_db(is_admin, internal_id):
+        menu = admin_menu()
+    else:
+        menu = main_menu()
+    await query.message.reply_text("Главное меню:", reply_markup=menu)
+
+
+# ========= SELECT SELF (with pagination support) =========
+@router.route("select_self", "next", parse=_cursor("next"), error="Неверный номер страницы.")
+@router.route("select_self", "prev", parse=_cursor("prev"), error="Неверный номер страницы.")
+@router.route("select_self", "page", parse=_legacy_page, error="Неверный номер страницы.")
+async def select_self_page(update: Update, context: ContextTypes.DEFAULT_TYPE, cursor):
+    direction, cursor_id = cursor
+    markup = await run_db(users_page_markup, "select_self", cursor_id, direction)
+    await update.callback_query.message.edit_reply_markup(reply_markup=markup)
+
+
+# new format: select_self:user:ID, legacy format: select_self:ID
+@router.route("select_self", "user", parse=int, error="Неверный пользователь.")
+@router.route("select_self", parse=int, error="Неверный пользователь.")
+async def select_self_user(update: Update, context: ContextTypes.DEFAULT_TYPE, user_id: int):
+    context.user_data["pending_self_id"] = user_id
+    name = await run_db(get_user_name, user_id)
+
+    keyboard = [
+        [InlineKeyboardButton("✅ Да, это я", callback_data="confirm_self")],
+        [InlineKeyboardButton("❌ Нет, вернуться", callback_data="cancel_self")],
+    ]
+
+    await update.callback_query.message.reply_text(
+        f"Подтверди, что ты — {name}:",
+        reply_markup=InlineKeyboardMarkup(keyboard),
+    )
+
+
+@router.route("confirm_self")
+async def confirm_self(update: Update, context: ContextTypes.DEFAULT_TYPE, arg):
+    query = update.callback_query
+    user_id = context.user_data.get("pending_self_id")
+    if user_id is None:
+        await query.message.reply_text("Ошибка. Начни заново.")
+        return
 
+    success = await run_db(create_binding, query.from_user.id, user_id)
+    if not success:
         await query.message.reply_text(
-            f"Подтверди, что ты — {name}:",
-            reply_markup=InlineKeyboardMarkup(keyboard),
+            "❌ Этот пользователь уже занят.",
+            reply_markup=main_menu(),
         )
+        context.user_data.clear()
         return
 
-    if data == "confirm_self":
-        user_id = context.user_data.get("pending_self_id")
-        if user_id is None:
-            await query.message.reply_text("Ошибка. Начни заново.")
-            return
-
-        success = create_binding(tg_id, user_id)
-        if not success:
-            await query.message.reply_text(
-                "❌ Этот пользователь уже занят.",
-                reply_markup=main_menu(),
-            )
-            context.user_data.clear()
-            return
+    context.user_data.clear()
+    context.user_data["internal_id"] = user_id
+
+    # Check if user is admin and show appropriate menu
+    is_admin_user = await run_db(is_admin, user_id)
+    menu = admin_menu() if is_admin_user else main_menu()
+
+    await query.message.reply_text(
+        "✅ Ты успешно вошёл!",
+        reply_markup=menu,
+    )
 
-        context.user_data.clear()
-        context.user_data["internal_id"] = user_id
 
-        # Check if user is admin and show appropriate menu
-        is_admin_user = is_admin(user_id)
-        menu = admin_menu() if is_admin_user else main_menu()
+@router.route("cancel_self")
+async def cancel_self(update: Update, context: ContextTypes.DEFAULT_TYPE, arg):
+    context.user_data.clear()
+    await update.callback_query.message.reply_text(
+        "Выбор отменён. Используй /start",
+    )
 
+
+# ========= GIVE PLUS =========
+@router.route("give_plus")
+async def give_plus(update: Update, context: ContextTypes.DEFAULT_TYPE, arg):
+    query = update.callback_query
+    internal_id = await run_db(get_binding_by_telegram_id, query.from_user.id)
+    if internal_id is None:
         await query.message.reply_text(
-            "✅ Ты успешно вошёл!",
-            reply_markup=menu,
+            "Сначала выбери себя через /start",
+            reply_markup=main_menu(),
         )
         return
 
-    if data == "cancel_self":
-        context.user_data.clear()
+    context.user_data["internal_id"] = internal_id
+    # Пока открыт выбор, текстовое сообщение ищет получателя по имени
+    context.user_data["user_search"] = "choose_user"
+
+    # exclude self
+    markup = await run_db(
+        users_page_markup, "choose_user", exclude_id=internal_id, show_back_to_menu=True
+    )
+
+    await query.message.reply_text(
+        "Кому поставить плюсик  ?\n🔎 Или напиши часть имени",
+        reply_markup=markup,
+    )
+
+
+# ========= CHOOSE USER (with pagination support) =========
+@router.route("choose_user", "next", parse=_cursor("next"), error="Неверный номер страницы.")
+@router.route("choose_user", "prev", parse=_cursor("prev"), error="Неверный номер страницы.")
+@router.route("choose_user", "page", parse=_legacy_page, error="Неверный номер страницы.")
+async def choose_user_page(update: Update, context: ContextTypes.DEFAULT_TYPE, cursor):
+    direction, cursor_id = cursor
+    query = update.callback_query
+    internal_id = await get_or_restore_internal_id(context, query.from_user.id)
+    if internal_id is None:
         await query.message.reply_text(
-            "Выбор отменён. Используй /start",
+            "❌ Сначала выбери себя через /start",
+            reply_markup=main_menu(),
         )
         return
+    markup = await run_db(
+        users_page_markup, "choose_user", cursor_id, direction, exclude_id=internal_id, show_back_to_menu=True
+    )
+    await query.message.edit_reply_markup(reply_markup=markup)
+
+
+# choose_user:user:ID, legacy format: choose:ID
+@router.route("choose_user", "user", parse=int, error="Неверный пользователь.")
+@router.route("choose", parse=int, error="Неверный пользователь.")
+async def choose_user(update: Update, context: ContextTypes.DEFAULT_TYPE, to_id: int):
+    context.user_data.pop("user_search", None)
+    context.user_data["plus_to"] = to_id
+    await update.callback_query.message.reply_text(
+        "За что ставим плюсик  ?",
+        reply_markup=reasons_keyboard(),
+    )
+
+
+# ========= REASON =========
+@router.route("reason")
+async def reason(update: Update, context: ContextTypes.DEFAULT_TYPE, key: str):
+    query = update.callback_query
 
-    # ========= GIVE PLUS =========
-    if data == "give_plus":
-        internal_id = get_binding_by_telegram_id(tg_id)
-        if internal_id is None:
-            await query.message.reply_text(
-                "Сначала выбери себя через /start",
-                reply_markup=main_menu(),
-            )
-            return
+    if key == "other":
+        context.user_data["awaiting_custom_reason"] = True
+        await query.message.reply_text("✍️ Напиши свою причину")
+        return
 
-        context.user_data["internal_id"] = internal_id
+    if key not in REASONS:
+        return
+    context.user_data["pending_reason"] = key
+    context.user_data.pop("pending_reason_text", None)
 
-        users = get_all_users()
-        # exclude self
-        users = [(uid, name) for uid, name in users if uid != internal_id]
+    await query.message.reply_text(
+        "Хочешь добавить комментарий?",
+        reply_markup=comment_keyboard(),
+    )
 
+
+# ========= SKIP COMMENT =========
+@router.route("skip_comment")
+async def skip_comment(update: Update, context: ContextTypes.DEFAULT_TYPE, arg):
+    query = update.callback_query
+    internal_id = await get_or_restore_internal_id(context, query.from_user.id)
+    if internal_id is None:
         await query.message.reply_text(
-            "Кому поставить плюсик  ?",
-            reply_markup=build_users_pagination(
-                users=users, page=0, action="choose_user", show_back_to_menu=True
-            ),
-            
+            "❌ Сначала выбери себя через /start",
+            reply_markup=main_menu(),
         )
         return
 
-    # ========= CHOOSE USER (with pagination support) =========
-    if data.startswith("choose_user:") or data.startswith("choose:"):
-        if data.startswith("choose:") and not data.startswith("choose_user:"):
-            parts = data.split(":")
-            if len(parts) >= 2:
-                try:
-                    to_id = int(parts[1])
-                    context.user_data["plus_to"] = to_id
-                    await query.message.reply_text(
-                        "За что ставим плюсик  ?",
-                        reply_markup=reasons_keyboard(),
-                    )
-                    return
-                except ValueError:
-                    await query.message.reply_text("Неверный пользователь.")
-                    return
-
-        parts = data.split(":")
-        # pagination: choose_user:page:N
-        if len(parts) >= 3 and parts[1] == "page":
-            try:
-                page = int(parts[2])
-            except ValueError:
-                await query.message.reply_text("Неверный номер страницы.")
-                return
-            internal_id = get_or_restore_internal_id(context, tg_id)
-            if internal_id is None:
-                await query.message.reply_text(
-                    "❌ Сначала выбери себя через /start",
-                    reply_markup=main_menu(),
-                )
-                return
-            users = get_all_users()
-            if internal_id is not None:
-                users = [(uid, name) for uid, name in users if uid != internal_id]
-            await query.message.edit_reply_markup(
-                reply_markup=build_users_pagination(
-                    users=users, page=page, action="choose_user", show_back_to_menu=True
-                )
-            )
-            return
-
-        # choose_user:user:ID
-        if len(parts) >= 3 and parts[1] == "user":
-            try:
-                to_id = int(parts[2])
-            except ValueError:
-                await query.message.reply_text("Неверный пользователь.")
-                return
-            context.user_data["plus_to"] = to_id
-            await query.message.reply_text(
-                "За что ставим плюсик  ?",
-                reply_markup=reasons_keyboard(),
-            )
-            return
-
-    # ========= REASON =========
-    if data.startswith("reason:"):
-        key = data.split(":", 1)[1]
-
-        if key == "other":
-            context.user_data["awaiting_custom_reason"] = True
-            await query.message.reply_text("✍️ Напиши свою причину")
-            return
-
-        context.user_data["pending_reason"] = REASONS[key]
-
-        keyboard = [
-            [InlineKeyboardButton("✍️ Добавить комментарий", callback_data="add_comment")],
-            [InlineKeyboardButton("⏭ Пропустить", callback_data="skip_comment")],
-        ]
-
+    await submit_plus(
+        from_id=internal_id,
+        to_id=context.user_data["plus_to"],
+        reason=context.user_data["pending_reason"],
+        reason_text=context.user_data.get("pending_reason_text"),
+        comment=None,
+    )
+
+    context.user_data.clear()
+    await query.message.reply_text(
+        "✅ Плюсик добавлен!",
+        reply_markup=main_menu(),
+    )
+
+
+# ========= ADD COMMENT =========
+@router.route("add_comment")
+async def add_comment(update: Update, context: ContextTypes.DEFAULT_TYPE, arg):
+    context.user_data["awaiting_comment_text"] = True
+    await update.callback_query.message.reply_text("✍️ Напиши комментарий (до 300 символов)")
+
+
+# ========= STATUS =========
+@router.route("status", parse=lambda arg: None)
+@router.route("status", "older", parse=_cursor("older"), error="Неверный номер страницы.")
+@router.route("status", "newer", parse=_cursor("newer"), error="Неверный номер страницы.")
+async def status(update: Update, context: ContextTypes.DEFAULT_TYPE, cursor):
+    query = update.callback_query
+    internal_id = await get_or_restore_internal_id(context, query.from_user.id)
+    if internal_id is None:
         await query.message.reply_text(
-            "Хочешь добавить комментарий?",
-            reply_markup=InlineKeyboardMarkup(keyboard),
+            "Сначала выбери себя через /start",
+            reply_markup=main_menu(),
         )
         return
 
-    # ========= SKIP COMMENT =========
-    if data == "skip_comment":
-        internal_id = get_or_restore_internal_id(context, query.from_user.id)
-        if internal_id is None:
-            await query.message.reply_text(
-                "❌ Сначала выбери себя через /start",
-                reply_markup=main_menu(),
-            )
-            return
-
-        save_plus(
-            from_id=internal_id, 
-            to_id=context.user_data["plus_to"],
-            reason=context.user_data["pending_reason"],
-            comment=None,
+    direction, cursor_id = cursor or ("older", None)
+    text, emoji_offsets, first_id, last_id, has_newer, has_older = await run_db(
+        get_status_page, internal_id, direction, cursor_id
+    )
+    entities = [
+        MessageEntity(type=MessageEntity.CUSTOM_EMOJI, offset=offset, length=1, custom_emoji_id=PLUS_EMOJI_ID)
+        for offset in emoji_offsets
+    ]
+    markup = build_cursor_pagination("status", first_id, last_id, has_newer, has_older)
+
+    if cursor is not None:
+        await query.message.edit_text(text, entities=entities, reply_markup=markup)
+    else:
+        await query.message.reply_text(text, entities=entities, reply_markup=markup)
+
+
+# ========= SHOP =========
+@router.route("shop")
+async def shop(update: Update, context: ContextTypes.DEFAULT_TYPE, arg):
+    query = update.callback_query
+    internal_id = await get_or_restore_internal_id(context, query.from_user.id)
+    if internal_id is None:
+        await query.message.reply_text(
+            "Сначала выбери себя через /start",
+            reply_markup=main_menu(),
         )
+        return
 
-        context.user_data.clear()
+    catalog = await run_db(get_catalog_snapshot)
+    balance = await run_db(get_balance, internal_id)
+
+    lines = [f"🛍️ Магазин — у тебя {balance} плюсов:\n"]
+    keyboard = []
+    for key, name, price, _, _, remaining in catalog:
+        # Sold out items are hidden
+        if remaining == 0:
+            continue
+
+        if remaining is not None:
+            lines.append(f"{name} — {price} плюсов (осталось: {remaining})")
+        else:
+            lines.append(f"{name} — {price} плюсов")
+        keyboard.append([InlineKeyboardButton(f"Купить ({price}➕)", callback_data=f"buy:{key}")])
+
+    keyboard.append([InlineKeyboardButton("⬅️ Назад", callback_data="back")])
+
+    text = "\n".join(lines)
+    await send_long_message(query.message, text, reply_markup=InlineKeyboardMarkup(keyboard))
+
+
+@router.route("buy")
+async def buy(update: Update, context: ContextTypes.DEFAULT_TYPE, item_key: str):
+    query = update.callback_query
+    internal_id = await get_or_restore_internal_id(context, query.from_user.id)
+    if internal_id is None:
         await query.message.reply_text(
-            "✅ Плюсик добавлен!",
+            "Сначала выбери себя через /start",
             reply_markup=main_menu(),
         )
         return
 
-
-    # ========= ADD COMMENT =========
-    if data == "add_comment":
-        context.user_data["awaiting_comment_text"] = True
-        await query.message.reply_text("✍️ Напиши комментарий (до 300 символов)")
+    catalog = await run_db(get_catalog)
+    if item_key not in catalog:
+        await query.message.reply_text("Товар не найден.")
         return
 
-    # ========= STATUS =========
-    if data == "status":
-        internal_id = get_or_restore_internal_id(context, tg_id)
-        if internal_id is None:
-            await query.message.reply_text(
-                "Сначала выбери себя через /start",
-                reply_markup=main_menu(),
-            )
-            return
-
-        conn = sqlite3.connect(DB_PATH)
-        c = conn.cursor()
-        c.execute(
-            """
-            SELECT p.reason, p.comment, u.name
-            FROM pluses p
-            JOIN users u ON u.id = p.from_id
-            WHERE p.to_id = ?
-            ORDER BY p.created_at
-            """,
-            (internal_id,),
-        )
-        rows = c.fetchall()
-        conn.close()
+    name, price, _ = catalog[item_key]
+    context.user_data["pending_buy"] = item_key
 
-        balance = get_balance(internal_id)
-        entities = []
+    keyboard = [
+        [InlineKeyboardButton(f"✅ Купить {name} за {price}➕", callback_data=f"confirm_buy:{item_key}")],
+        [InlineKeyboardButton("❌ Отмена", callback_data="cancel_buy")],
+    ]
+
+    await query.message.reply_text(f"Купить {name} за {price} плюсов?", reply_markup=InlineKeyboardMarkup(keyboard))
 
-        if not rows:
-            text = "У тебя пока нет плюсиков 🙂"
-        else:
-            lines = []
 
-            emoji_id = "5458840666563970188" 
-            current_offset = 0
+@router.route("confirm_buy")
+async def confirm_buy(update: Update, context: ContextTypes.DEFAULT_TYPE, item_key: str):
+    query = update.callback_query
+    internal_id = await get_or_restore_internal_id(context, query.from_user.id)
+    if internal_id is None:
+        await query.message.reply_text(
+            "Сначала выбери себя через /start",
+            reply_markup=main_menu(),
+        )
+        return
 
-            header = f"🌟 Твои плюсики ({balance}/{len(rows)}):\n"
-            lines.append(header)
-            current_offset += _utf16_len(header)
+    success, msg = await run_db(buy_item, internal_id, item_key)
+    # clear pending
+    context.user_data.pop("pending_buy", None)
+    await query.message.reply_text(msg, reply_markup=main_menu())
 
-            for reason, comment, name in rows:
-                line = f"➕ {reason} — от {name}"
 
-                entities.append(
-                    MessageEntity(
-                        type=MessageEntity.CUSTOM_EMOJI,
-                        offset=current_offset,
-                        length=_utf16_len("➕"),
-                        custom_emoji_id=emoji_id,
-                    )
-                )
+@router.route("cancel_buy")
+async def cancel_buy(update: Update, context: ContextTypes.DEFAULT_TYPE, arg):
+    context.user_data.pop("pending_buy", None)
+    await update.callback_query.message.reply_text("Покупка отменена.", reply_markup=main_menu())
 
-                lines.append(line)
-                current_offset += _utf16_len(line)
 
-                if comment:
-                    comment_line = f"\n   💬 {comment}"
-                    lines.append(comment_line)
-                    current_offset += _utf16_len(comment_line)
+# ========= PURCHASES =========
+@router.route("purchases")
+async def purchases(update: Update, context: ContextTypes.DEFAULT_TYPE, arg):
+    query = update.callback_query
+    internal_id = await get_or_restore_internal_id(context, query.from_user.id)
+    if internal_id is None:
+        await query.message.reply_text(
+            "Сначала выбери себя через /start",
+            reply_markup=main_menu(),
+        )
+        return
 
-                lines.append("\n")
-                current_offset += _utf16_len("\n")
+    purchases = await run_db(get_user_purchases, internal_id)
+    if not purchases:
+        text = "Ты ещё ничего не купил 🙂"
+    else:
+        lines = [f"📦 Твои покупки ({len(purchases)}):\n"]
+        for item_name, price, created_at in purchases:
+            lines.append(f"✓ {item_name} — {price} плюсов")
+            lines.append(f"  {created_at}")
+            lines.append("")
+        text = "\n".join(lines)
 
-            text = "".join(lines)
+    is_admin_user = await run_db(is_admin, internal_id)
+    menu = admin_menu() if is_admin_user else main_menu()
+    await send_long_message(query.message, text, reply_markup=menu)
 
 
-        is_admin_user = is_admin(internal_id)
-        menu = admin_menu() if is_admin_user else main_menu()
-        await send_long_message(query.message, text, reply_markup=menu, entities=entities)
-        return
+# ========= ADMIN: ADD USER =========
+@router.route("admin_add_user")
+@admin_only
+async def admin_add_user(update: Update, context: ContextTypes.DEFAULT_TYPE, arg):
+    context.user_data["awaiting_new_user_name"] = True
+    await update.callback_query.message.reply_text("👤 Напиши имя нового пользователя", reply_markup=back_keyboard())
 
-    # ========= SHOP =========
-    if data == "shop":
-        internal_id = get_or_restore_internal_id(context, tg_id)
-        if internal_id is None:
-            await query.message.reply_text(
-                "Сначала выбери себя через /start",
-                reply_markup=main_menu(),
-            )
-            return
-
-        catalog = get_catalog()
-        balance = get_balance(internal_id)
-
-        lines = [f"🛍️ Магазин — у тебя {balance} плюсов:\n"]
-        keyboard = []
-        for key, item_data in catalog.items():
-            name = item_data[0]
-            price = item_data[1]
-            
-            # Check if item is in stock
-            if not is_in_stock(key):
-                continue
-            
-            remaining = get_remaining_stock(key)
-            if remaining is not None:
-                lines.append(f"{name} — {price} плюсов (осталось: {remaining})")
-            else:
-                lines.append(f"{name} — {price} плюсов")
-            keyboard.append([InlineKeyboardButton(f"Купить ({price}➕)", callback_data=f"buy:{key}")])
-
-        keyboard.append([InlineKeyboardButton("⬅️ Назад", callback_data="back")])
 
-        text = "\n".join(lines)
-        await send_long_message(query.message, text, reply_markup=InlineKeyboardMarkup(keyboard))
-        return
+# ========= ADMIN: ADD / REMOVE ITEMS =========
+@router.route("admin_add_item")
+@admin_only
+async def admin_add_item(update: Update, context: ContextTypes.DEFAULT_TYPE, arg):
+    context.user_data["awaiting_new_item"] = True
+    await update.callback_query.message.reply_text(
+        "🛒 Отправь данные товара в формате: key;name;price;stock(или пусто для неограниченного)\nПример: mug2;Моя кружка;10;5",
+        reply_markup=back_keyboard()
+    )
 
-    if data.startswith("buy:"):
-        item_key = data.split(":", 1)[1]
-        internal_id = get_or_restore_internal_id(context, tg_id)
-        if internal_id is None:
-            await query.message.reply_text(
-                "Сначала выбери себя через /start",
-                reply_markup=main_menu(),
-            )
-            return
-
-        catalog = get_catalog()
-        if item_key not in catalog:
-            await query.message.reply_text("Товар не найден.")
-            return
-
-        name, price, _ = catalog[item_key]
-        context.user_data["pending_buy"] = item_key
-
-        keyboard = [
-            [InlineKeyboardButton(f"✅ Купить {name} за {price}➕", callback_data=f"confirm_buy:{item_key}")],
-            [InlineKeyboardButton("❌ Отмена", callback_data="cancel_buy")],
-        ]
-
-        await query.message.reply_text(f"Купить {name} за {price} плюсов?", reply_markup=InlineKeyboardMarkup(keyboard))
+
+@router.route("admin_items")
+@admin_only
+async def admin_items(update: Update, context: ContextTypes.DEFAULT_TYPE, arg):
+    query = update.callback_query
+    items = await run_db(get_catalog_snapshot)
+    if not items:
+        await query.message.reply_text("Список товаров пуст.", reply_markup=admin_menu())
         return
 
-    if data.startswith("confirm_buy:"):
-        item_key = data.split(":", 1)[1]
-        internal_id = get_or_restore_internal_id(context, tg_id)
-        if internal_id is None:
-            await query.message.reply_text(
-                "Сначала выбери себя через /start",
-                reply_markup=main_menu(),
-            )
-            return
-
-        success, msg = buy_item(internal_id, item_key)
-        # clear pending
-        context.user_data.pop("pending_buy", None)
-        if success:
-            await query.message.reply_text(msg, reply_markup=main_menu())
+    lines = []
+    keyboard = []
+    for key, name, price, limit, sold, remaining in items:
+        if limit is None:
+            lines.append(f"{name} ({key}) — {price} плюсов (продано: {sold})")
         else:
-            await query.message.reply_text(msg, reply_markup=main_menu())
-        return
+            lines.append(f"{name} ({key}) — {price} плюсов (лимит: {limit}, осталось: {remaining})")
+        keyboard.append([InlineKeyboardButton(f"Удалить {key}", callback_data=f"admin_remove:{key}")])
 
-    if data == "cancel_buy":
-        context.user_data.pop("pending_buy", None)
-        await query.message.reply_text("Покупка отменена.", reply_markup=main_menu())
-        return
+    keyboard.append([InlineKeyboardButton("⬅️ Назад", callback_data="back")])
+    text = "\n".join(lines)
+    await send_long_message(query.message, text, reply_markup=InlineKeyboardMarkup(keyboard))
 
-    # ========= PURCHASES =========
-    if data == "purchases":
-        internal_id = get_or_restore_internal_id(context, tg_id)
-        if internal_id is None:
-            await query.message.reply_text(
-                "Сначала выбери себя через /start",
-                reply_markup=main_menu(),
-            )
-            return
-
-        purchases = get_user_purchases(internal_id)
-        if not purchases:
-            text = "Ты ещё ничего не купил 🙂"
-        else:
-            lines = [f"📦 Твои покупки ({len(purchases)}):\n"]
-            for item_name, price, created_at in purchases:
-                lines.append(f"✓ {item_name} — {price} плюсов")
-                lines.append(f"  {created_at}")
-                lines.append("")
-            text = "\n".join(lines)
-
-        is_admin_user = is_admin(internal_id)
-        menu = admin_menu() if is_admin_user else main_menu()
-        await send_long_message(query.message, text, reply_markup=menu)
-        return
 
-    # ========= ADMIN: ADD USER =========
-    if data == "admin_add_user":
-        internal_id = get_or_restore_internal_id(context, tg_id)
-        if internal_id is None or not is_admin(internal_id):
-            await query.message.reply_text(
-                "❌ У тебя нет прав администратора.",
-                reply_markup=main_menu(),
-            )
-            return
-
-        context.user_data["awaiting_new_user_name"] = True
-        keyboard = [[InlineKeyboardButton("⬅️ Назад", callback_data="back")]]
-        await query.message.reply_text("👤 Напиши имя нового пользователя", reply_markup=InlineKeyboardMarkup(keyboard))
+@router.route("admin_remove")
+@admin_only
+async def admin_remove(update: Update, context: ContextTypes.DEFAULT_TYPE, key: str):
+    success, msg = await run_db(remove_item, key)
+    await update.callback_query.message.reply_text(msg, reply_markup=admin_menu())
+
+
+def _clip(text: str, limit: int = 100) -> str:
+    return text if len(text) <= limit else text[:limit - 1] + "…"
+
+
+async def _show_history_page(query, page, lines: list[str], action: str, empty_text: str, edit: bool):
+    """Send the first history page, or edit the message in place when paging."""
+    if not lines:
+        await query.message.reply_text(empty_text, reply_markup=admin_menu())
         return
 
-    # ========= ADMIN: ADD / REMOVE ITEMS =========
-    if data == "admin_add_item":
-        internal_id = get_or_restore_internal_id(context, tg_id)
-        if internal_id is None or not is_admin(internal_id):
-            await query.message.reply_text(
-                "❌ У тебя нет прав администратора.",
-                reply_markup=main_menu(),
-            )
-            return
-
-        context.user_data["awaiting_new_item"] = True
-        keyboard = [[InlineKeyboardButton("⬅️ Назад", callback_data="back")]]
-        await query.message.reply_text(
-            "🛒 Отправь данные товара в формате: key;name;price;stock(или пусто для неограниченного)\nПример: mug2;Моя кружка;10;5",
-            reply_markup=InlineKeyboardMarkup(keyboard)
+    text = "\n".join(lines)
+    markup = build_history_pagination(page, action)
+    if edit:
+        await query.message.edit_text(text, reply_markup=markup)
+    else:
+        await query.message.reply_text(text, reply_markup=markup)
+
+
+# ========= ADMIN: VIEW ALL PLUSSES =========
+@router.route("admin_view_pluses", parse=lambda arg: None)
+@router.route("admin_view_pluses", "older", parse=_cursor("older"), error="Неверный номер страницы.")
+@router.route("admin_view_pluses", "newer", parse=_cursor("newer"), error="Неверный номер страницы.")
+@admin_only
+async def admin_view_pluses(update: Update, context: ContextTypes.DEFAULT_TYPE, cursor):
+    direction, cursor_id = cursor or ("older", None)
+    page = await run_db(get_pluses_page, cursor_id, direction, limit=PAGE_SIZE)
+
+    lines = []
+    for _, from_name, to_name, reason, comment, created_at in page[0]:
+        lines.append(
+            f"{created_at}: {from_name} → {to_name}: {_clip(reason)}"
+            + (f" ({_clip(comment)})" if comment else "")
         )
-        return
 
-    if data == "admin_items":
-        internal_id = get_or_restore_internal_id(context, tg_id)
-        if internal_id is None or not is_admin(internal_id):
-            await query.message.reply_text(
-                "❌ У тебя нет прав администратора.",
-                reply_markup=main_menu(),
-            )
-            return
-
-        items = get_all_items()
-        if not items:
-            await query.message.reply_text("Список товаров пуст.", reply_markup=admin_menu())
-            return
-
-        lines = []
-        keyboard = []
-        for key, name, price, limit in items:
-            if limit is None:
-                lines.append(f"{name} ({key}) — {price} плюсов")
-            else:
-                remaining = get_remaining_stock(key)
-                lines.append(f"{name} ({key}) — {price} плюсов (лимит: {limit}, осталось: {remaining})")
-            keyboard.append([InlineKeyboardButton(f"Удалить {key}", callback_data=f"admin_remove:{key}")])
-
-        keyboard.append([InlineKeyboardButton("⬅️ Назад", callback_data="back")])
-        text = "\n".join(lines)
-        await send_long_message(query.message, text, reply_markup=InlineKeyboardMarkup(keyboard))
-        return
+    await _show_history_page(
+        update.callback_query, page, lines, "admin_view_pluses", "Плюсиков пока нет.", edit=cursor is not None
+    )
 
-    if data.startswith("admin_remove:"):
-        key = data.split(":", 1)[1]
-        internal_id = get_or_restore_internal_id(context, tg_id)
-        if internal_id is None or not is_admin(internal_id):
-            await query.message.reply_text(
-                "❌ У тебя нет прав администратора.",
-                reply_markup=main_menu(),
-            )
-            return
-
-        success, msg = remove_item(key)
-        await query.message.reply_text(msg, reply_markup=admin_menu())
-        return
 
-    # ========= ADMIN: VIEW ALL PLUSSES =========
-    if data == "admin_view_pluses":
-        internal_id = get_or_restore_internal_id(context, tg_id)
-        if internal_id is None or not is_admin(internal_id):
-            await query.message.reply_text(
-                "❌ У тебя нет прав администратора.",
-                reply_markup=main_menu(),
-            )
-            return
-
-        rows = get_recent_pluses(100)
-        if not rows:
-            await query.message.reply_text("Плюсиков пока нет.", reply_markup=admin_menu())
-            return
-
-        lines = []
-        for from_id, from_name, to_id, to_name, reason, comment, created_at in rows:
-            lines.append(f"{created_at}: {from_name} → {to_name}: {reason}" + (f" ({comment})" if comment else ""))
+# ========= ADMIN: VIEW ALL PURCHASES =========
+@router.route("admin_view_purchases", parse=lambda arg: None)
+@router.route("admin_view_purchases", "older", parse=_cursor("older"), error="Неверный номер страницы.")
+@router.route("admin_view_purchases", "newer", parse=_cursor("newer"), error="Неверный номер страницы.")
+@admin_only
+async def admin_view_purchases(update: Update, context: ContextTypes.DEFAULT_TYPE, cursor):
+    direction, cursor_id = cursor or ("older", None)
+    page = await run_db(get_purchases_page, cursor_id, direction, limit=PAGE_SIZE)
 
-        text = "\n".join(lines)
-        await send_long_message(query.message, text, reply_markup=admin_menu())
-        return
+    lines = []
+    for _, user_name, item_name, price, created_at in page[0]:
+        lines.append(f"{created_at}: {user_name} купил {item_name} за {price} плюсов")
 
-    # ========= ADMIN: VIEW ALL PURCHASES =========
-    if data == "admin_view_purchases":
-        internal_id = get_or_restore_internal_id(context, tg_id)
-        if internal_id is None or not is_admin(internal_id):
-            await query.message.reply_text(
-                "❌ У тебя нет прав администратора.",
-                reply_markup=main_menu(),
-            )
-            return
-
-        rows = get_recent_purchases(100)
-        if not rows:
-            await query.message.reply_text("Покупок пока нет.", reply_markup=admin_menu())
-            return
-
-        lines = []
-        for user_id, user_name, item_name, price, created_at in rows:
-            lines.append(f"{created_at}: {user_name} купил {item_name} за {price} плюсов")
+    await _show_history_page(
+        update.callback_query, page, lines, "admin_view_purchases", "Покупок пока нет.", edit=cursor is not None
+    )
 
-        text = "\n".join(lines)
-        await send_long_message(query.message, text, reply_markup=admin_menu())
-        return
 
-    # ========= GIVEN HISTORY (who I sent pluses to) =========
-    if data == "given_history":
-        internal_id = get_or_restore_internal_id(context, tg_id)
-        if internal_id is None:
-            await query.message.reply_text(
-                "Сначала выбери себя через /start",
-                reply_markup=main_menu(),
-            )
-            return
-
-        rows = get_pluses_given_by_user(internal_id)
-        is_admin_user = is_admin(internal_id)
-        menu = admin_menu() if is_admin_user else main_menu()
-        
-        if not rows:
-            await query.message.reply_text("Ты ещё не отправлял плюсики.", reply_markup=menu)
-            return
-
-        lines = []
-        for reason, comment, to_name, created_at in rows:
-            lines.append(f"{created_at}: → {to_name}: {reason}" + (f" ({comment})" if comment else ""))
+# ========= ADMIN: CSV EXPORT =========
+EXPORT_TITLES = {"pluses": "Плюсики", "purchases": "Покупки"}
 
-        text = "\n".join(lines)
-        await send_long_message(query.message, text, reply_markup=menu)
-        return
 
-    # ========= ADMIN: DELETE USER =========
-    if data == "admin_delete_user":
-        internal_id = get_or_restore_internal_id(context, tg_id)
-        if internal_id is None or not is_admin(internal_id):
-            await query.message.reply_text(
-                "❌ У тебя нет прав администратора.",
-                reply_markup=main_menu(),
-            )
-            return
-
-        users = get_all_users()
-        if not users:
-            await query.message.reply_text("Список пользователей пуст.", reply_markup=admin_menu())
-            return
+def _export_period(kind: str):
+    """Route parser for `export:<kind>:<period>` buttons."""
+    def parse(arg: str):
+        if arg not in PERIODS:
+            raise ValueError(arg)
+        return kind, arg
+    return parse
+
+
+@router.route("admin_export")
+@admin_only
+async def admin_export(update: Update, context: ContextTypes.DEFAULT_TYPE, arg):
+    keyboard = [
+        [InlineKeyboardButton(title, callback_data=f"export_pick:{kind}")]
+        for kind, title in EXPORT_TITLES.items()
+    ]
+    keyboard.append([InlineKeyboardButton("⬅️ Назад", callback_data="back")])
+    await update.callback_query.message.reply_text(
+        "📤 Что выгрузить?",
+        reply_markup=InlineKeyboardMarkup(keyboard),
+    )
+
 
+@router.route("export_pick")
+@admin_only
+async def export_pick(update: Update, context: ContextTypes.DEFAULT_TYPE, kind: str):
+    if kind not in EXPORT_TITLES:
+        return
+    keyboard = [
+        [InlineKeyboardButton(title, callback_data=f"export:{kind}:{period}")]
+        for period, title in PERIODS.items()
+    ]
+    keyboard.append([InlineKeyboardButton("⬅️ Назад", callback_data="admin_export")])
+    await update.callback_query.message.edit_text(
+        f"📤 {EXPORT_TITLES[kind]}: за какой период?",
+        reply_markup=InlineKeyboardMarkup(keyboard),
+    )
+
+
+@router.route("export", "pluses", parse=_export_period("pluses"), error="Неверный период.")
+@router.route("export", "purchases", parse=_export_period("purchases"), error="Неверный период.")
+@admin_only
+async def export(update: Update, context: ContextTypes.DEFAULT_TYPE, target):
+    query = update.callback_query
+    kind, period = target
+    since, until = period_bounds(period)
+
+    await query.message.edit_text(f"⏳ Готовлю выгрузку: {EXPORT_TITLES[kind]}, {PERIODS[period].lower()}…")
+    file, count = await run_db(export_csv, kind, since, until)
+    try:
+        # PTB читает документ в память целиком перед отправкой
+        await query.message.reply_document(
+            document=file,
+            filename=f"{kind}_{since or 'start'}_{until or date.today().isoformat()}.csv",
+            caption=f"{EXPORT_TITLES[kind]}: {count} строк",
+            reply_markup=admin_menu(),
+        )
+    finally:
+        file.close()
+
+
+# ========= ADMIN: LEADERBOARD =========
+@router.route("admin_top")
+@admin_only
+async def admin_top(update: Update, context: ContextTypes.DEFAULT_TYPE, arg):
+    text, markup = await render_top(current_month(), None)
+    await update.callback_query.message.reply_text(text, reply_markup=markup)
+
+
+@router.route("top", parse=parse_top_args, error="Неверный период.")
+@admin_only
+async def top_page(update: Update, context: ContextTypes.DEFAULT_TYPE, target):
+    month, reason_key = target
+    text, markup = await render_top(month, reason_key)
+    try:
+        await update.callback_query.message.edit_text(text, reply_markup=markup)
+    except BadRequest as e:
+        # Нажата уже выбранная причина (или кнопка дважды) — экран не изменился
+        if "not modified" not in str(e):
+            raise
+
+
+# ========= ADMIN: ANALYTICS =========
+@router.route("admin_analytics")
+@admin_only
+async def admin_analytics(update: Update, context: ContextTypes.DEFAULT_TYPE, arg):
+    trends = await run_db(get_reason_trends)
+
+    lines = ["📈 Плюсики по причинам", "за год · за 30 дней · по неделям за год", ""]
+    for _, title, weekly, recent in trends:
+        lines.append(f"{title}: {sum(weekly)} · {recent}")
+        lines.append(sparkline(weekly))
+    lines.append("")
+    lines.append("Данные обновляются раз в несколько минут.")
+    await update.callback_query.message.reply_text(
+        "\n".join(lines),
+        reply_markup=back_keyboard(),
+    )
+
+
+# ========= GIVEN HISTORY (who I sent pluses to) =========
+@router.route("given_history")
+async def given_history(update: Update, context: ContextTypes.DEFAULT_TYPE, arg):
+    query = update.callback_query
+    internal_id = await get_or_restore_internal_id(context, query.from_user.id)
+    if internal_id is None:
         await query.message.reply_text(
-            "👥 Выбери пользователя для удаления:",
-            reply_markup=build_users_pagination(
-                users=users, page=0, action="delete_user", show_back_to_menu=True
-            ),
+            "Сначала выбери себя через /start",
+            reply_markup=main_menu(),
         )
         return
 
-    # ========= DELETE USER (with pagination support) =========
-    if data.startswith("delete_user:"):
-        parts = data.split(":")
-
-        # pagination: delete_user:page:N
-        if len(parts) >= 3 and parts[1] == "page":
-            try:
-                page = int(parts[2])
-            except ValueError:
-                await query.message.reply_text("Неверный номер страницы.")
-                return
-            internal_id = get_or_restore_internal_id(context, tg_id)
-            if internal_id is None or not is_admin(internal_id):
-                await query.message.reply_text(
-                    "❌ Нет прав администратора.",
-                    reply_markup=main_menu(),
-                )
-                return
-            users = get_all_users()
-            await query.message.edit_reply_markup(
-                reply_markup=build_users_pagination(
-                    users=users, page=page, action="delete_user", show_back_to_menu=True
-                )
-            )
-            return
-
-        # delete_user:user:ID
-        if len(parts) >= 3 and parts[1] == "user":
-            try:
-                user_id = int(parts[2])
-            except ValueError:
-                await query.message.reply_text("Неверный пользователь.")
-                return
-
-            user_name = get_user_name(user_id)
-            keyboard = [
-                [InlineKeyboardButton("✅ Да, удалить", callback_data=f"confirm_delete_user:{user_id}")],
-                [InlineKeyboardButton("⬅️ Назад", callback_data="back")],
-            ]
-
-            await query.message.reply_text(
-                f"Удалить пользователя '{user_name}'?",
-                reply_markup=InlineKeyboardMarkup(keyboard),
-            )
-            return
-
-    if data.startswith("confirm_delete_user:"):
-        try:
-            user_id = int(data.split(":", 1)[1])
-        except (ValueError, IndexError):
-            await query.message.reply_text("Ошибка при удалении.")
-            return
-
-        internal_id = get_or_restore_internal_id(context, tg_id)
-        if internal_id is None or not is_admin(internal_id):
-            await query.message.reply_text(
-                "❌ Нет прав администратора.",
-                reply_markup=main_menu(),
-            )
-            return
-
-        user_name = get_user_name(user_id)
-        conn = sqlite3.connect(DB_PATH)
-        c = conn.cursor()
-
-        # Удаляем привязку если есть
-        c.execute("DELETE FROM telegram_bindings WHERE user_id = ?", (user_id,))
-        # Удаляем самого пользователя
-        c.execute("DELETE FROM users WHERE id = ?", (user_id,))
-
-        conn.commit()
-        conn.close()
+    rows = await run_db(get_pluses_given_by_user, internal_id)
+    is_admin_user = await run_db(is_admin, internal_id)
+    menu = admin_menu() if is_admin_user else main_menu()
 
-        await query.message.reply_text(
-            f"✅ Пользователь '{user_name}' удалён.",
-            reply_markup=admin_menu(),
-        )
+    if not rows:
+        await query.message.reply_text("Ты ещё не отправлял плюсики.", reply_markup=menu)
         return
+
+    lines = []
+    for reason, comment, to_name, created_at in rows:
+        lines.append(f"{created_at}: → {to_name}: {reason}" + (f" ({comment})" if comment else ""))
+
+    text = "\n".join(lines)
+    await send_long_message(query.message, text, reply_markup=menu)
+
+
+# ========= ADMIN: DELETE USER =========
+@router.route("admin_delete_user")
+@admin_only
+async def admin_delete_user(update: Update, context: ContextTypes.DEFAULT_TYPE, arg):
+    query = update.callback_query
+    markup = await run_db(users_page_markup, "delete_user", show_back_to_menu=True)
+    if markup is None:
+        await query.message.reply_text("Список пользователей пуст.", reply_markup=admin_menu())
+        return
+
+    context.user_data["user_search"] = "delete_user"
+    await query.message.reply_text(
+        "👥 Выбери пользователя для удаления:\n🔎 Или напиши часть имени",
+        reply_markup=markup,
+    )
+
+
+# ========= DELETE USER (with pagination support) =========
+@router.route("delete_user", "next", parse=_cursor("next"), error="Неверный номер страницы.")
+@router.route("delete_user", "prev", parse=_cursor("prev"), error="Неверный номер страницы.")
+@router.route("delete_user", "page", parse=_legacy_page, error="Неверный номер страницы.")
+@admin_only
+async def delete_user_page(update: Update, context: ContextTypes.DEFAULT_TYPE, cursor):
+    direction, cursor_id = cursor
+    markup = await run_db(users_page_markup, "delete_user", cursor_id, direction, show_back_to_menu=True)
+    await update.callback_query.message.edit_reply_markup(reply_markup=markup)
+
+
+@router.route("delete_user", "user", parse=int, error="Неверный пользователь.")
+@admin_only
+async def delete_user_pick(update: Update, context: ContextTypes.DEFAULT_TYPE, user_id: int):
+    context.user_data.pop("user_search", None)
+    user_name = await run_db(get_user_name, user_id)
+    keyboard = [
+        [InlineKeyboardButton("✅ Да, удалить", callback_data=f"confirm_delete_user:{user_id}")],
+        [InlineKeyboardButton("⬅️ Назад", callback_data="back")],
+    ]
+
+    await update.callback_query.message.reply_text(
+        f"Удалить пользователя '{user_name}'?",
+        reply_markup=InlineKeyboardMarkup(keyboard),
+    )
+
+
+@router.route("confirm_delete_user", parse=int, error="Ошибка при удалении.")
+@admin_only
+async def confirm_delete_user(update: Update, context: ContextTypes.DEFAULT_TYPE, user_id: int):
+    user_name = await run_db(get_user_name, user_id)
+    telegram_ids = await run_db(delete_user, user_id)
+    # internal_id в сохранённом user_data иначе пережил бы удаление
+    for telegram_id in telegram_ids:
+        context.application.drop_user_data(telegram_id)
+
+    await update.callback_query.message.reply_text(
+        f"✅ Пользователь '{user_name}' удалён.",
+        reply_markup=admin_menu(),
+    )
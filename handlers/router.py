@@ -0,0 +1,76 @@
+# -*- coding: utf-8 -*-
+
+import functools
+
+from telegram import Update
+from telegram.ext import ContextTypes
+
+from db import run_db
+from services.auth import get_or_restore_internal_id
+from services.users import is_admin
+from ui import main_menu
+
+
+class CallbackRouter:
+    """Dispatch callback_data of the form `action[:kind[:arg]]` to handlers.
+
+    Handlers are registered per action, optionally narrowed to a kind
+    (`select_self:page:N`, `select_self:user:ID`). Lookup is one or two dict
+    hits, whatever the number of routes. A handler is called as
+    `handler(update, context, arg)`, where `arg` has already been passed
+    through the route's `parse` function.
+    """
+
+    def __init__(self):
+        # (action, kind | None) -> (handler, parse, error_text)
+        self._routes = {}
+
+    def route(self, action: str, kind: str | None = None, parse=None, error: str | None = None):
+        """Register a handler. If `parse` raises ValueError, `error` is replied instead."""
+        def decorator(func):
+            self._routes[(action, kind)] = (func, parse, error)
+            return func
+        return decorator
+
+    def resolve(self, data: str):
+        """Return (route, raw_arg) for `data`, or (None, None) if nothing matches."""
+        action, sep, rest = data.partition(":")
+        if sep:
+            kind, sep, arg = rest.partition(":")
+            if sep:
+                route = self._routes.get((action, kind))
+                if route is not None:
+                    return route, arg
+        return self._routes.get((action, None)), rest
+
+    async def dispatch(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        query = update.callback_query
+        route, arg = self.resolve(query.data or "")
+        if route is None:
+            return
+
+        handler, parse, error = route
+        if parse is not None:
+            try:
+                arg = parse(arg)
+            except ValueError:
+                await query.message.reply_text(error)
+                return
+
+        await handler(update, context, arg)
+
+
+def admin_only(handler):
+    """Reject the callback unless the pressing user is a bound administrator."""
+    @functools.wraps(handler)
+    async def wrapper(update: Update, context: ContextTypes.DEFAULT_TYPE, arg):
+        query = update.callback_query
+        internal_id = await get_or_restore_internal_id(context, query.from_user.id)
+        if internal_id is None or not await run_db(is_admin, internal_id):
+            await query.message.reply_text(
+                "❌ У тебя нет прав администратора.",
+                reply_markup=main_menu(),
+            )
+            return
+        await handler(update, context, arg)
+    return wrapper
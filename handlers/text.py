@@ -1,12 +1,14 @@
 # -*- coding: utf-8 -*-
 
-from telegram import Update, InlineKeyboardMarkup, InlineKeyboardButton
+from telegram import Update
 from telegram.ext import ContextTypes
 
-from services.pluses import save_plus
+from db import run_db
+from services.pluses import submit_plus
 from services.users import add_user, user_exists, is_admin
 from services.auth import get_or_restore_internal_id
-from ui import admin_menu
+from services.search import search_users
+from ui import admin_menu, main_menu, comment_keyboard, build_users_pagination, PAGE_SIZE
 from services.shop import add_item
 
 
@@ -20,15 +22,15 @@ async def handle_text(update: Update, context: ContextTypes.DEFAULT_TYPE):
             await update.message.reply_text("Имя должно быть хотя бы из 2 символов.")
             return
 
-        if user_exists(text):
+        if await run_db(user_exists, text):
             await update.message.reply_text(f"❌ Пользователь '{text}' уже существует.")
             return
 
-        user_id = add_user(text, is_admin_flag=False)
+        user_id = await run_db(add_user, text, is_admin_flag=False)
         context.user_data.pop("awaiting_new_user_name", None)
         
-        internal_id = get_or_restore_internal_id(context, tg_id)
-        menu = admin_menu() if internal_id and is_admin(internal_id) else None
+        internal_id = await get_or_restore_internal_id(context, tg_id)
+        menu = admin_menu() if internal_id and await run_db(is_admin, internal_id) else None
         
         await update.message.reply_text(
             f"✅ Пользователь '{text}' добавлен (ID: {user_id}).",
@@ -60,11 +62,11 @@ async def handle_text(update: Update, context: ContextTypes.DEFAULT_TYPE):
                 await update.message.reply_text("Запас должен быть числом или оставь пустым для неограниченного.")
                 return
 
-        success, msg = add_item(key, name, price, stock)
+        success, msg = await run_db(add_item, key, name, price, stock)
         context.user_data.pop("awaiting_new_item", None)
 
-        internal_id = get_or_restore_internal_id(context, update.effective_user.id)
-        menu = admin_menu() if internal_id and is_admin(internal_id) else None
+        internal_id = await get_or_restore_internal_id(context, update.effective_user.id)
+        menu = admin_menu() if internal_id and await run_db(is_admin, internal_id) else None
 
         await update.message.reply_text(msg, reply_markup=menu)
         return
@@ -76,18 +78,12 @@ async def handle_text(update: Update, context: ContextTypes.DEFAULT_TYPE):
             return
 
         context.user_data.pop("awaiting_custom_reason", None)
-        context.user_data["pending_reason"] = f"Другое: {text}"
-
-        keyboard = [
-            [{"text": "✍️ Добавить комментарий", "callback_data": "add_comment"}],
-            [{"text": "⏭ Пропустить", "callback_data": "skip_comment"}],
-        ]
+        context.user_data["pending_reason"] = "other"
+        context.user_data["pending_reason_text"] = text
 
         await update.message.reply_text(
             "Хочешь добавить комментарий?",
-            reply_markup=InlineKeyboardMarkup(
-                [[InlineKeyboardButton(**btn) for btn in row] for row in keyboard]
-            ),
+            reply_markup=comment_keyboard(),
         )
         return
 
@@ -96,10 +92,11 @@ async def handle_text(update: Update, context: ContextTypes.DEFAULT_TYPE):
         comment = text[:300]
 
         try:
-            save_plus(
+            await submit_plus(
                 from_id=context.user_data["internal_id"],
                 to_id=context.user_data["plus_to"],
                 reason=context.user_data["pending_reason"],
+                reason_text=context.user_data.get("pending_reason_text"),
                 comment=comment,
             )
         except KeyError:
@@ -114,3 +111,32 @@ async def handle_text(update: Update, context: ContextTypes.DEFAULT_TYPE):
             "✅ Плюсик с комментарием успешно добавлен!"
         )
         return
+
+    # ===== Поиск пользователя по части имени (выбор получателя / удаление) =====
+    action = context.user_data.get("user_search")
+    if action:
+        internal_id = await get_or_restore_internal_id(context, tg_id)
+        if internal_id is None:
+            await update.message.reply_text(
+                "Сначала выбери себя через /start",
+                reply_markup=main_menu(),
+            )
+            return
+
+        if action == "delete_user" and not await run_db(is_admin, internal_id):
+            context.user_data.pop("user_search", None)
+            return
+
+        exclude_id = internal_id if action == "choose_user" else None
+        matches = await run_db(search_users, text, limit=PAGE_SIZE, exclude_id=exclude_id)
+        if not matches:
+            await update.message.reply_text(f"🔎 Никого не нашёл по «{text}». Попробуй иначе.")
+            return
+
+        await update.message.reply_text(
+            "🔎 Нашёл:",
+            reply_markup=build_users_pagination(
+                page=(matches, False, False), action=action, show_back_to_menu=True
+            ),
+        )
+        return
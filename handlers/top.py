@@ -0,0 +1,64 @@
+# -*- coding: utf-8 -*-
+
+import re
+
+from telegram import Update
+from telegram.ext import ContextTypes
+
+from constants import REASONS
+from db import run_db
+from services.auth import get_or_restore_internal_id
+from services.leaderboard import current_month, get_top, shift_month
+from services.users import is_admin
+from ui import main_menu, build_top_keyboard
+
+MONTH_RE = re.compile(r"^\d{4}-(0[1-9]|1[0-2])$")
+
+
+def parse_top_args(arg: str) -> tuple[str, str | None]:
+    """`YYYY-MM:<reason key|all>` from top:... buttons -> (month, reason_key or None)."""
+    month, _, key = arg.partition(":")
+    if not MONTH_RE.match(month) or (key != "all" and key not in REASONS):
+        raise ValueError(arg)
+    return month, None if key == "all" else key
+
+
+async def render_top(month: str, reason_key: str | None):
+    """Text and keyboard of the leaderboard screen."""
+    rows = await run_db(get_top, month, reason_key)
+
+    title = f"🏆 Топ за {month}"
+    if reason_key is not None:
+        title += f"\n{REASONS[reason_key]}"
+    if rows:
+        lines = [f"{place}. {name} — {count}" for place, (name, count) in enumerate(rows, 1)]
+    else:
+        lines = ["Плюсиков за этот период нет."]
+
+    this_month = current_month()
+    markup = build_top_keyboard(
+        month,
+        shift_month(month, -1),
+        shift_month(month, 1) if month < this_month else None,
+        reason_key,
+    )
+    return title + "\n\n" + "\n".join(lines), markup
+
+
+async def top(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """/top [YYYY-MM] — leaderboard of the month, administrators only."""
+    internal_id = await get_or_restore_internal_id(context, update.effective_user.id)
+    if internal_id is None or not await run_db(is_admin, internal_id):
+        await update.message.reply_text(
+            "❌ У тебя нет прав администратора.",
+            reply_markup=main_menu(),
+        )
+        return
+
+    month = context.args[0] if context.args else current_month()
+    if not MONTH_RE.match(month):
+        await update.message.reply_text("Формат: /top или /top ГГГГ-ММ")
+        return
+
+    text, markup = await render_top(month, None)
+    await update.message.reply_text(text, reply_markup=markup)
@@ -0,0 +1,74 @@
+# -*- coding: utf-8 -*-
+
+import time
+
+from telegram.ext import ContextTypes, JobQueue
+
+from config import (
+    ROLLUP_INTERVAL,
+    OPTIMIZE_INTERVAL,
+    CHECKPOINT_INTERVAL,
+    CHECKPOINT_MODE,
+    VACUUM_INTERVAL,
+    CACHE_WARMUP,
+)
+from db import run_db, roll_up_pluses, optimize, checkpoint_wal, incremental_vacuum
+from services.search import warm_search_index
+from services.shop import warm_shop_cache
+from services.users import warm_users_cache
+
+# name -> (время окончания по time.time(), длительность в секундах)
+# последнего успешного запуска каждой задачи
+last_runs = {}
+
+
+async def _timed(name: str, func, *args):
+    # Задачи выполняются на пуле потоков БД, не в event loop; ошибка одной
+    # задачи не должна остановить остальные
+    started = time.perf_counter()
+    try:
+        result = await run_db(func, *args)
+    except Exception as e:
+        print(f"Maintenance {name} failed: {e}")
+        return None
+    elapsed = time.perf_counter() - started
+    last_runs[name] = (time.time(), elapsed)
+    print(f"Maintenance {name}: {elapsed * 1000:.0f} ms ({result})")
+    return result
+
+
+async def roll_up_job(context: ContextTypes.DEFAULT_TYPE):
+    await _timed("rollup", roll_up_pluses)
+
+
+async def optimize_job(context: ContextTypes.DEFAULT_TYPE):
+    await _timed("optimize", optimize)
+
+
+async def checkpoint_job(context: ContextTypes.DEFAULT_TYPE):
+    await _timed("checkpoint", checkpoint_wal, CHECKPOINT_MODE)
+
+
+async def vacuum_job(context: ContextTypes.DEFAULT_TYPE):
+    await _timed("vacuum", incremental_vacuum)
+
+
+async def warmup_job(context: ContextTypes.DEFAULT_TYPE):
+    await _timed("warmup users", warm_users_cache)
+    await _timed("warmup shop", warm_shop_cache)
+    await _timed("warmup search", warm_search_index)
+
+
+def schedule_maintenance(job_queue: JobQueue):
+    """Register the periodic maintenance jobs and the startup cache warmup."""
+    if CACHE_WARMUP:
+        job_queue.run_once(warmup_job, when=0, name="warmup")
+    jobs = (
+        ("rollup", roll_up_job, ROLLUP_INTERVAL),
+        ("optimize", optimize_job, OPTIMIZE_INTERVAL),
+        ("checkpoint", checkpoint_job, CHECKPOINT_INTERVAL),
+        ("vacuum", vacuum_job, VACUUM_INTERVAL),
+    )
+    for name, callback, interval in jobs:
+        if interval > 0:
+            job_queue.run_repeating(callback, interval=interval, first=interval, name=name)
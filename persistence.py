@@ -0,0 +1,142 @@
+# -*- coding: utf-8 -*-
+
+import asyncio
+import json
+
+from telegram.ext import BasePersistence, PersistenceInput
+
+from db import get_connection, run_db, transaction
+
+
+def load_user_data(user_id: int) -> dict | None:
+    with get_connection() as conn:
+        row = conn.execute("SELECT data FROM user_data WHERE user_id = ?", (user_id,)).fetchone()
+    return json.loads(row[0]) if row else None
+
+
+def save_user_data(batch: dict[int, str | None]):
+    """Write serialized user_data in one transaction; None deletes the row."""
+    upserts = [(user_id, data) for user_id, data in batch.items() if data is not None]
+    deletes = [(user_id,) for user_id, data in batch.items() if data is None]
+    with transaction() as conn:
+        if upserts:
+            conn.executemany(
+                """
+                INSERT INTO user_data (user_id, data) VALUES (?, ?)
+                ON CONFLICT(user_id) DO UPDATE SET data = excluded.data, updated_at = CURRENT_TIMESTAMP
+                """,
+                upserts,
+            )
+        if deletes:
+            conn.executemany("DELETE FROM user_data WHERE user_id = ?", deletes)
+
+
+class SQLitePersistence(BasePersistence):
+    """Keep context.user_data in the bot's SQLite database across restarts.
+
+    Only user_data is stored. Nothing is read at startup: a user's data is
+    loaded on their first update after a restart (refresh_user_data). The
+    Application hands over changed users every `update_interval` seconds;
+    entries whose JSON did not change since the last write are skipped and
+    the rest go to the database in one transaction.
+    """
+
+    def __init__(self, update_interval: float):
+        super().__init__(
+            store_data=PersistenceInput(bot_data=False, chat_data=False, callback_data=False),
+            update_interval=update_interval,
+        )
+        self._loaded = set()  # telegram ids whose stored data is already merged
+        self._written = {}  # telegram id -> JSON last written (or read)
+        self._dirty = {}  # telegram id -> JSON to write, None to delete
+        self._writer = None
+
+    async def get_user_data(self) -> dict:
+        return {}
+
+    async def refresh_user_data(self, user_id: int, user_data: dict):
+        if user_id in self._loaded:
+            return
+        stored = await run_db(load_user_data, user_id)
+        self._loaded.add(user_id)
+        if stored:
+            self._written[user_id] = json.dumps(stored, ensure_ascii=False)
+            for key, value in stored.items():
+                user_data.setdefault(key, value)
+
+    async def update_user_data(self, user_id: int, data: dict):
+        serialized = json.dumps(data, ensure_ascii=False)
+        if self._written.get(user_id) == serialized:
+            self._dirty.pop(user_id, None)
+            return
+        self._dirty[user_id] = serialized
+        self._schedule_write()
+
+    async def drop_user_data(self, user_id: int):
+        # Строка удаляется в фоне — не подгружать её, пока она ещё в базе
+        self._loaded.add(user_id)
+        self._dirty[user_id] = None
+        self._schedule_write()
+
+    def _schedule_write(self):
+        if self._writer is None or self._writer.done():
+            self._writer = asyncio.create_task(self._write_dirty())
+
+    async def _write_dirty(self):
+        # update_persistence() calls update_user_data for every changed user
+        # at once; yield so they all land in the same batch
+        await asyncio.sleep(0)
+        while self._dirty:
+            batch, self._dirty = self._dirty, {}
+            try:
+                await run_db(save_user_data, batch)
+            except Exception as e:
+                print(f"user_data write failed, will retry: {e}")
+                self._dirty = {**batch, **self._dirty}
+                return
+            for user_id, data in batch.items():
+                if data is None:
+                    self._written.pop(user_id, None)
+                else:
+                    self._written[user_id] = data
+
+    async def flush(self):
+        if self._writer is not None:
+            await self._writer
+        if self._dirty:
+            await self._write_dirty()
+
+    # Остальные данные не сохраняются (store_data выше), но методы обязательны
+
+    async def get_chat_data(self) -> dict:
+        return {}
+
+    async def get_bot_data(self) -> dict:
+        return {}
+
+    async def get_callback_data(self):
+        return None
+
+    async def get_conversations(self, name: str) -> dict:
+        return {}
+
+    async def update_conversation(self, name: str, key, new_state):
+        pass
+
+    async def update_chat_data(self, chat_id: int, data: dict):
+        pass
+
+    async def update_bot_data(self, data: dict):
+        pass
+
+    async def update_callback_data(self, data):
+        pass
+
+    async def drop_chat_data(self, chat_id: int):
+        pass
+
+    async def refresh_chat_data(self, chat_id: int, chat_data: dict):
+        pass
+
+    async def refresh_bot_data(self, bot_data: dict):
+        pass
@@ -0,0 +1,183 @@
+# -*- coding: utf-8 -*-
+
+import asyncio
+import time
+
+from telegram import MessageEntity
+from telegram.error import RetryAfter
+
+# Telegram ограничивает текст сообщения 4096 единицами UTF-16
+MESSAGE_LIMIT = 4096
+# Минимальный интервал между сообщениями в один чат, секунды
+CHAT_SEND_INTERVAL = 1.0
+# Сколько раз повторять отправку после RetryAfter
+SEND_RETRIES = 3
+
+# Сущности, которые нельзя разрезать между сообщениями
+_ATOMIC_ENTITIES = {
+    MessageEntity.CUSTOM_EMOJI,
+    MessageEntity.MENTION,
+    MessageEntity.TEXT_MENTION,
+    MessageEntity.URL,
+    MessageEntity.TEXT_LINK,
+    MessageEntity.EMAIL,
+    MessageEntity.PHONE_NUMBER,
+    MessageEntity.HASHTAG,
+    MessageEntity.CASHTAG,
+    MessageEntity.BOT_COMMAND,
+}
+
+
+def utf16_len(text: str) -> int:
+    """Length of `text` in UTF-16 code units, the unit of Telegram entity offsets."""
+    return len(text.encode("utf-16-le")) // 2
+
+
+def _char_len(char: str) -> int:
+    return 2 if ord(char) > 0xFFFF else 1
+
+
+def _rebase(entities, start: int, end: int) -> list[MessageEntity]:
+    """Entities overlapping [start, end) moved to a chunk starting at `start`."""
+    rebased = []
+    for e in entities:
+        e_start = max(e.offset, start)
+        e_end = min(e.offset + e.length, end)
+        if e_start >= e_end:
+            continue
+        rebased.append(
+            MessageEntity(
+                type=e.type,
+                offset=e_start - start,
+                length=e_end - e_start,
+                url=e.url,
+                user=e.user,
+                language=e.language,
+                custom_emoji_id=e.custom_emoji_id,
+            )
+        )
+    return rebased
+
+
+def _split_line(line: str, char_pos: int, u16_pos: int, limit: int, atomic):
+    """Cut a line longer than `limit` into pieces, see split_message."""
+    start, u16_start = 0, u16_pos
+    while start < len(line):
+        end, u16_end = start, u16_start
+        while end < len(line) and u16_end + _char_len(line[end]) - u16_start <= limit:
+            u16_end += _char_len(line[end])
+            end += 1
+        if end < len(line):
+            crossing = [e.offset for e in atomic if u16_start < e.offset < u16_end < e.offset + e.length]
+            if crossing:
+                while u16_end > min(crossing):
+                    end -= 1
+                    u16_end -= _char_len(line[end])
+        yield char_pos + start, u16_start, line[start:end], u16_end - u16_start
+        start, u16_start = end, u16_end
+
+
+def split_message(text: str, entities=None, limit: int = MESSAGE_LIMIT) -> list[tuple[str, list[MessageEntity]]]:
+    """Split `text` into [(chunk, entities), ...], each at most `limit` UTF-16 units.
+
+    Chunks end on line boundaries. A single line longer than `limit` is cut
+    between characters (never inside a surrogate pair), before an atomic
+    entity (custom emoji, link, mention, ...) rather than through it.
+    Formatting entities spanning a cut are split in two. Every chunk gets
+    its own entities with offsets relative to the chunk.
+    """
+    entities = sorted(entities or [], key=lambda e: e.offset)
+    atomic = [e for e in entities if e.type in _ATOMIC_ENTITIES]
+
+    # (char_start, utf16_start, text, utf16_length) of every line
+    pieces = []
+    char_pos = u16_pos = 0
+    for line in text.splitlines(keepends=True):
+        length = utf16_len(line)
+        if length <= limit:
+            pieces.append((char_pos, u16_pos, line, length))
+        else:
+            pieces.extend(_split_line(line, char_pos, u16_pos, limit, atomic))
+        char_pos += len(line)
+        u16_pos += length
+
+    chunks = []
+    chunk = None  # [char_start, u16_start, char_end, u16_end]
+    for char_start, u16_start, piece, length in pieces:
+        if chunk is None and not piece.strip():
+            # Telegram срезает пустые строки в начале сообщения, что сдвинуло бы сущности
+            continue
+        if chunk is not None and u16_start + length - chunk[1] > limit:
+            chunks.append(chunk)
+            chunk = None
+            if not piece.strip():
+                continue
+        if chunk is None:
+            chunk = [char_start, u16_start, char_start, u16_start]
+        chunk[2] = char_start + len(piece)
+        chunk[3] = u16_start + length
+    if chunk is not None:
+        chunks.append(chunk)
+
+    return [
+        (text[char_start:char_end], _rebase(entities, u16_start, u16_end))
+        for char_start, u16_start, char_end, u16_end in chunks
+    ]
+
+
+class ChatRateLimiter:
+    """Space out messages to the same chat by `interval` seconds.
+
+    Each send reserves the next free slot of its chat before sleeping, so
+    concurrent senders to one chat queue up in order while other chats
+    are not delayed at all.
+    """
+
+    def __init__(self, interval: float):
+        self.interval = interval
+        self._next_slot = {}  # chat_id -> monotonic time of the next free slot
+
+    async def wait(self, chat_id: int):
+        now = time.monotonic()
+        slot = max(now, self._next_slot.get(chat_id, now))
+        self._next_slot[chat_id] = slot + self.interval
+        if len(self._next_slot) > 1000:
+            self._prune(now)
+        if slot > now:
+            await asyncio.sleep(slot - now)
+
+    def delay(self, chat_id: int, seconds: float):
+        """Push the chat's next slot back after Telegram answered RetryAfter."""
+        self._next_slot[chat_id] = max(self._next_slot.get(chat_id, 0), time.monotonic() + seconds)
+
+    def _prune(self, now: float):
+        for chat_id in [c for c, slot in self._next_slot.items() if slot < now]:
+            del self._next_slot[chat_id]
+
+
+_limiter = ChatRateLimiter(CHAT_SEND_INTERVAL)
+
+
+async def _send(message, text: str, entities, reply_markup):
+    chat_id = message.chat_id
+    for attempt in range(SEND_RETRIES + 1):
+        await _limiter.wait(chat_id)
+        try:
+            return await message.reply_text(text, entities=entities or None, reply_markup=reply_markup)
+        except RetryAfter as e:
+            if attempt == SEND_RETRIES:
+                raise
+            _limiter.delay(chat_id, e.retry_after)
+
+
+async def send_long_message(message, text: str, reply_markup=None, entities=None):
+    """Reply to `message` with `text`, split into as many messages as needed.
+
+    Chunks are cut on line boundaries with their own entities (split_message)
+    and sent one by one through the per-chat rate limiter; RetryAfter from
+    Telegram is waited out and the chunk resent. `reply_markup` goes on
+    the last chunk.
+    """
+    chunks = split_message(text, entities)
+    for i, (chunk, chunk_entities) in enumerate(chunks):
+        await _send(message, chunk, chunk_entities, reply_markup if i == len(chunks) - 1 else None)
@@ -0,0 +1,54 @@
+# -*- coding: utf-8 -*-
+
+from datetime import datetime, timedelta, timezone
+
+from db import get_connection
+
+SPARK_BARS = "▁▂▃▄▅▆▇█"
+
+
+def _week_starts(weeks: int) -> list[str]:
+    # Недели в свёртке — даты понедельников в UTC, как created_at
+    today = datetime.now(timezone.utc).date()
+    monday = today - timedelta(days=today.weekday())
+    return [(monday - timedelta(weeks=i)).isoformat() for i in range(weeks - 1, -1, -1)]
+
+
+def sparkline(values: list[int]) -> str:
+    top = max(values, default=0)
+    if not top:
+        return SPARK_BARS[0] * len(values)
+    return "".join(SPARK_BARS[value * (len(SPARK_BARS) - 1) // top] for value in values)
+
+
+def get_reason_trends(weeks: int = 52, days: int = 30) -> list[tuple[str, str, list[int], int]]:
+    """Per-reason trends from the rollups, most used reasons first.
+
+    Returns [(key, title, weekly_counts, last_days_count), ...]:
+    `weekly_counts` covers the last `weeks` weeks, oldest first, the current
+    (partial) week included. Reads only plus_daily/plus_weekly, so the result
+    lags the pluses table by at most one roll-up interval.
+    """
+    week_starts = _week_starts(weeks)
+    since = (datetime.now(timezone.utc).date() - timedelta(days=days)).isoformat()
+    with get_connection() as conn:
+        c = conn.cursor()
+        c.execute("SELECT id, key, title FROM reasons ORDER BY id")
+        reasons = c.fetchall()
+        c.execute(
+            "SELECT week, reason_id, count FROM plus_weekly WHERE week >= ?",
+            (week_starts[0],),
+        )
+        weekly = {(week, reason_id): count for week, reason_id, count in c.fetchall()}
+        c.execute(
+            "SELECT reason_id, SUM(count) FROM plus_daily WHERE day >= ? GROUP BY reason_id",
+            (since,),
+        )
+        recent = dict(c.fetchall())
+
+    trends = []
+    for reason_id, key, title in reasons:
+        counts = [weekly.get((week, reason_id), 0) for week in week_starts]
+        trends.append((key, title, counts, recent.get(reason_id, 0)))
+    trends.sort(key=lambda t: sum(t[2]), reverse=True)
+    return trends
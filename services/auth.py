@@ -1,9 +1,10 @@
 # -*- coding: utf-8 -*-
 
+from db import run_db
 from services.bindings import get_binding_by_telegram_id
 
 
-def get_or_restore_internal_id(context, telegram_id: int) -> int | None:
+async def get_or_restore_internal_id(context, telegram_id: int) -> int | None:
     """
     Возвращает internal user_id для telegram_id.
 
@@ -16,7 +17,7 @@ def get_or_restore_internal_id(context, telegram_id: int) -> int | None:
     if internal_id is not None:
         return internal_id
 
-    internal_id = get_binding_by_telegram_id(telegram_id)
+    internal_id = await run_db(get_binding_by_telegram_id, telegram_id)
     if internal_id is not None:
         context.user_data["internal_id"] = internal_id
         return internal_id
@@ -1,45 +1,58 @@
 # -*- coding: utf-8 -*-
 
 import sqlite3
-from config import DB_PATH
+from cache import TTLCache
+from config import CACHE_MAXSIZE, CACHE_TTL
+from db import get_connection, transaction
 
+# telegram_id -> user_id (None тоже кэшируется: "привязки нет")
+_bindings_cache = TTLCache(CACHE_MAXSIZE, CACHE_TTL)
 
-def get_binding_by_telegram_id(tg_id: int):
-    conn = sqlite3.connect(DB_PATH)
-    c = conn.cursor()
-    c.execute(
-        "SELECT user_id FROM telegram_bindings WHERE telegram_id = ?",
-        (tg_id,),
-    )
-    row = c.fetchone()
-    conn.close()
+
+def _load_binding(tg_id: int):
+    with get_connection() as conn:
+        c = conn.cursor()
+        c.execute(
+            "SELECT user_id FROM telegram_bindings WHERE telegram_id = ?",
+            (tg_id,),
+        )
+        row = c.fetchone()
     return row[0] if row else None
 
 
+def get_binding_by_telegram_id(tg_id: int):
+    return _bindings_cache.get_or_load(tg_id, lambda: _load_binding(tg_id))
+
+
 def create_binding(telegram_id: int, user_id: int) -> bool:
-    conn = sqlite3.connect(DB_PATH)
-    c = conn.cursor()
     try:
-        c.execute(
-            "INSERT INTO telegram_bindings (telegram_id, user_id) VALUES (?, ?)",
-            (telegram_id, user_id),
-        )
-        conn.commit()
+        with transaction() as conn:
+            conn.execute(
+                "INSERT INTO telegram_bindings (telegram_id, user_id) VALUES (?, ?)",
+                (telegram_id, user_id),
+            )
         return True
     except sqlite3.IntegrityError:
         return False
     finally:
-        conn.close()
+        invalidate_binding(telegram_id)
 
 
 def delete_binding(telegram_id: int) -> bool:
-    conn = sqlite3.connect(DB_PATH)
-    c = conn.cursor()
-    c.execute(
-        "DELETE FROM telegram_bindings WHERE telegram_id = ?",
-        (telegram_id,),
-    )
-    deleted = c.rowcount > 0
-    conn.commit()
-    conn.close()
+    with transaction() as conn:
+        c = conn.execute(
+            "DELETE FROM telegram_bindings WHERE telegram_id = ?",
+            (telegram_id,),
+        )
+        deleted = c.rowcount > 0
+    invalidate_binding(telegram_id)
     return deleted
+
+
+def invalidate_binding(telegram_id: int):
+    """Drop the cached binding for `telegram_id` after it changed in the DB."""
+    _bindings_cache.invalidate(telegram_id)
+
+
+def cache_stats() -> dict:
+    return _bindings_cache.stats()
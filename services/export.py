@@ -0,0 +1,94 @@
+# -*- coding: utf-8 -*-
+
+import csv
+import io
+from datetime import date, datetime, timedelta, timezone
+from tempfile import SpooledTemporaryFile
+
+from db import get_connection
+from services.pluses import REASON_TITLE_SQL
+
+# Выгрузка держится в памяти до этого размера, дальше уходит во временный файл
+SPOOL_MAX_SIZE = 1024 * 1024
+
+EXPORTS = {
+    "pluses": (
+        ["id", "created_at", "from_id", "from_name", "to_id", "to_name", "reason_key", "reason", "comment"],
+        f"""
+        SELECT p.id, p.created_at, p.from_id, fu.name, p.to_id, tu.name, r.key, {REASON_TITLE_SQL}, p.comment
+        FROM pluses p
+        JOIN reasons r ON r.id = p.reason_id
+        LEFT JOIN users fu ON fu.id = p.from_id
+        LEFT JOIN users tu ON tu.id = p.to_id
+        WHERE (? IS NULL OR p.created_at >= ?) AND (? IS NULL OR p.created_at < ?)
+        ORDER BY p.created_at, p.id
+        """,
+    ),
+    "purchases": (
+        ["id", "created_at", "user_id", "user_name", "item_key", "item_name", "price"],
+        """
+        SELECT p.id, p.created_at, p.user_id, u.name, p.item_key, p.item_name, p.price
+        FROM purchases p
+        LEFT JOIN users u ON u.id = p.user_id
+        WHERE (? IS NULL OR p.created_at >= ?) AND (? IS NULL OR p.created_at < ?)
+        ORDER BY p.created_at, p.id
+        """,
+    ),
+}
+
+PERIODS = {
+    "all": "За всё время",
+    "30d": "Последние 30 дней",
+    "quarter": "Текущий квартал",
+    "prev_quarter": "Прошлый квартал",
+}
+
+
+def period_bounds(period: str, today: date | None = None) -> tuple[str | None, str | None]:
+    """Return [since, until) dates as 'YYYY-MM-DD' (None = unbounded) for a PERIODS key.
+
+    `today` defaults to the current UTC date, the zone of created_at.
+    """
+    today = today or datetime.now(timezone.utc).date()
+    if period == "all":
+        return None, None
+    if period == "30d":
+        return (today - timedelta(days=30)).isoformat(), None
+
+    quarter_start = date(today.year, (today.month - 1) // 3 * 3 + 1, 1)
+    if period == "quarter":
+        return quarter_start.isoformat(), None
+    if period == "prev_quarter":
+        prev_start = date(
+            quarter_start.year - (quarter_start.month == 1),
+            (quarter_start.month - 4) % 12 + 1,
+            1,
+        )
+        return prev_start.isoformat(), quarter_start.isoformat()
+    raise ValueError(f"Unknown period: {period}")
+
+
+def export_csv(kind: str, since: str | None = None, until: str | None = None) -> tuple[SpooledTemporaryFile, int]:
+    """Write `kind` ("pluses" | "purchases") rows in [since, until) as CSV.
+
+    Rows are streamed from the cursor straight into a spooled temp file, so
+    memory use doesn't depend on the number of rows. Returns the binary
+    file rewound to the start (UTF-8 with BOM, for Excel) and the row count.
+    The caller closes the file.
+    """
+    header, sql = EXPORTS[kind]
+    out = SpooledTemporaryFile(max_size=SPOOL_MAX_SIZE)
+    text = io.TextIOWrapper(out, encoding="utf-8-sig", newline="")
+    writer = csv.writer(text)
+    writer.writerow(header)
+
+    count = 0
+    with get_connection() as conn:
+        for row in conn.execute(sql, (since, since, until, until)):
+            writer.writerow(row)
+            count += 1
+
+    text.flush()
+    text.detach()
+    out.seek(0)
+    return out, count
@@ -0,0 +1,53 @@
+# -*- coding: utf-8 -*-
+
+from datetime import datetime, timezone
+
+from db import get_connection
+
+
+def current_month() -> str:
+    """Current month as 'YYYY-MM' in UTC, the zone of pluses.created_at."""
+    return datetime.now(timezone.utc).strftime("%Y-%m")
+
+
+def shift_month(month: str, delta: int) -> str:
+    year, mon = map(int, month.split("-"))
+    index = year * 12 + mon - 1 + delta
+    return f"{index // 12:04d}-{index % 12 + 1:02d}"
+
+
+def get_top(month: str, reason_key: str | None = None, limit: int = 10) -> list[tuple[str, int]]:
+    """Top recipients of `month` ('YYYY-MM'), optionally for one REASONS key.
+
+    Returns [(name, count), ...] best first. Reads the incrementally
+    maintained counters through their (month, ..., count DESC) indexes,
+    never the pluses table.
+    """
+    with get_connection() as conn:
+        c = conn.cursor()
+        if reason_key is None:
+            c.execute(
+                """
+                SELECT u.name, t.count
+                FROM plus_month_totals t
+                JOIN users u ON u.id = t.user_id
+                WHERE t.month = ?
+                ORDER BY t.count DESC, t.user_id
+                LIMIT ?
+                """,
+                (month, limit),
+            )
+        else:
+            c.execute(
+                """
+                SELECT u.name, t.count
+                FROM plus_counters t
+                JOIN users u ON u.id = t.user_id
+                WHERE t.month = ? AND t.reason_key = ?
+                ORDER BY t.count DESC, t.user_id
+                LIMIT ?
+                """,
+                (month, reason_key, limit),
+            )
+        rows = c.fetchall()
+    return rows
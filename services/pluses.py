@@ -1,46 +1,222 @@
 # -*- coding: utf-8 -*-
 
-import sqlite3
-from config import DB_PATH
+import asyncio
 
+from constants import REASONS, reason_key
+from config import PLUS_BATCH_ENABLED, PLUS_BATCH_MAX_ROWS, PLUS_BATCH_MAX_DELAY_MS
+from db import get_connection, run_db, transaction
+from events import PLUS_GIVEN, publish
 
-def save_plus(from_id: int, to_id: int, reason: str, comment: str | None):
-    conn = sqlite3.connect(DB_PATH)
-    c = conn.cursor()
-    c.execute(
+
+# Текст причины для показа: сохранённый reason_text (своя причина
+# "Другое: ..." или свободный текст из версий бота до кодов причин), иначе
+# название из справочника. Запросу нужен JOIN reasons r ON r.id = p.reason_id
+REASON_TITLE_SQL = "COALESCE(p.reason_text, r.title)"
+
+
+def _reason_code(reason: str, reason_text: str | None) -> tuple[str, str | None]:
+    if reason in REASONS:
+        return reason, (None if reason_text is None else f"{REASONS[reason]}: {reason_text}")
+    # pending_reason в user_data, сохранённом до перехода на коды, — это
+    # готовый текст причины
+    key = reason_key(reason)
+    return key, (reason if key == "other" else None)
+
+
+def _apply_plus(conn, from_id: int, to_id: int, reason: str, reason_text: str | None, comment: str | None):
+    reason, reason_text = _reason_code(reason, reason_text)
+    conn.execute(
+        """
+        INSERT INTO pluses (from_id, to_id, reason_id, reason_text, comment)
+        VALUES (?, ?, (SELECT id FROM reasons WHERE key = ?), ?, ?)
+        """,
+        (from_id, to_id, reason, reason_text, comment),
+    )
+    conn.execute(
+        """
+        INSERT INTO balances (user_id, received) VALUES (?, 1)
+        ON CONFLICT(user_id) DO UPDATE SET received = received + 1
+        """,
+        (to_id,),
+    )
+    # Месяц берётся так же, как created_at (CURRENT_TIMESTAMP, UTC)
+    conn.execute(
         """
-        INSERT INTO pluses (from_id, to_id, reason, comment)
-        VALUES (?, ?, ?, ?)
+        INSERT INTO plus_counters (month, reason_key, user_id, count)
+        VALUES (strftime('%Y-%m', 'now'), ?, ?, 1)
+        ON CONFLICT(month, reason_key, user_id) DO UPDATE SET count = count + 1
         """,
-        (from_id, to_id, reason, comment),
+        (reason, to_id),
     )
-    conn.commit()
-    conn.close()
+    conn.execute(
+        """
+        INSERT INTO plus_month_totals (month, user_id, count)
+        VALUES (strftime('%Y-%m', 'now'), ?, 1)
+        ON CONFLICT(month, user_id) DO UPDATE SET count = count + 1
+        """,
+        (to_id,),
+    )
+
+
+def save_plus(from_id: int, to_id: int, reason: str, reason_text: str | None, comment: str | None):
+    """Save a plus; `reason` is a REASONS key, `reason_text` the user's text for "other".
+
+    The text is stored as shown, "Другое: <text>", in pluses.reason_text.
+    """
+    with transaction() as conn:
+        _apply_plus(conn, from_id, to_id, reason, reason_text, comment)
+    publish(PLUS_GIVEN, from_id=from_id, to_id=to_id)
+
+
+def save_pluses(rows: list[tuple[int, int, str, str | None, str | None]]):
+    """Save many (from_id, to_id, reason, reason_text, comment) pluses in one transaction."""
+    with transaction() as conn:
+        for row in rows:
+            _apply_plus(conn, *row)
+    for from_id, to_id, *_ in rows:
+        publish(PLUS_GIVEN, from_id=from_id, to_id=to_id)
+
+
+def _resolve(future: asyncio.Future, error: Exception | None = None):
+    # Обработчик мог быть отменён, пока плюс ждал записи
+    if future.done():
+        return
+    if error is None:
+        future.set_result(None)
+    else:
+        future.set_exception(error)
+
+
+class PlusWriteQueue:
+    """Write-behind queue that groups pluses into one transaction.
+
+    A batch is written when `max_rows` pluses are waiting or `max_delay`
+    seconds after the first of them arrived, whichever comes first.
+    `submit()` returns only after the plus is committed, so callers can
+    still confirm it to the user.
+    """
+
+    def __init__(self, max_rows: int, max_delay: float):
+        self.max_rows = max_rows
+        self.max_delay = max_delay
+        self._pending = []  # [(row, future), ...]
+        self._timer = None
+        self._write_lock = asyncio.Lock()
+
+    async def submit(self, from_id: int, to_id: int, reason: str, reason_text: str | None, comment: str | None):
+        future = asyncio.get_running_loop().create_future()
+        self._pending.append(((from_id, to_id, reason, reason_text, comment), future))
+        if len(self._pending) >= self.max_rows:
+            asyncio.ensure_future(self.flush())
+        elif self._timer is None:
+            self._timer = asyncio.ensure_future(self._flush_later())
+        await future
+
+    async def _flush_later(self):
+        await asyncio.sleep(self.max_delay)
+        self._timer = None
+        await self.flush()
+
+    async def flush(self):
+        """Write everything queued so far; also called on shutdown."""
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        async with self._write_lock:
+            batch, self._pending = self._pending, []
+            if not batch:
+                return
+            try:
+                await run_db(save_pluses, [row for row, _ in batch])
+            except Exception:
+                # Одна плохая строка не должна отменять весь пакет
+                for row, future in batch:
+                    try:
+                        await run_db(save_plus, *row)
+                    except Exception as e:
+                        _resolve(future, e)
+                    else:
+                        _resolve(future)
+                return
+            for _, future in batch:
+                _resolve(future)
+
+
+_plus_queue = PlusWriteQueue(PLUS_BATCH_MAX_ROWS, PLUS_BATCH_MAX_DELAY_MS / 1000)
+
+
+async def submit_plus(from_id: int, to_id: int, reason: str, reason_text: str | None, comment: str | None):
+    """Save a plus from a handler; returns once it is committed.
+
+    With PLUS_BATCH_ENABLED the plus goes through the write-behind queue,
+    otherwise it is written by its own transaction.
+    """
+    if PLUS_BATCH_ENABLED:
+        await _plus_queue.submit(from_id, to_id, reason, reason_text, comment)
+    else:
+        await run_db(save_plus, from_id, to_id, reason, reason_text, comment)
+
+
+async def flush_pluses():
+    await _plus_queue.flush()
 
 
 def get_pluses_given_by_user(user_id: int) -> list[tuple[str, str, str]]:
     """Return pluses given by user: (reason, comment, recipient_name, created_at)"""
-    conn = sqlite3.connect(DB_PATH)
-    c = conn.cursor()
-    c.execute(
-        "SELECT p.reason, p.comment, u.name, p.created_at FROM pluses p JOIN users u ON u.id = p.to_id WHERE p.from_id = ? ORDER BY p.created_at DESC",
-        (user_id,),
-    )
-    rows = c.fetchall()
-    conn.close()
+    with get_connection() as conn:
+        c = conn.cursor()
+        c.execute(
+            f"SELECT {REASON_TITLE_SQL}, p.comment, u.name, p.created_at FROM pluses p JOIN reasons r ON r.id = p.reason_id JOIN users u ON u.id = p.to_id WHERE p.from_id = ? ORDER BY p.created_at DESC",
+            (user_id,),
+        )
+        rows = c.fetchall()
     return rows
 
 
-def get_recent_pluses(limit: int = 100) -> list[tuple[int, str, int, str, str]]:
-    """Return 100 most recent pluses ordered from oldest to newest (ASC).
-    This fetches the newest 100 and displays them with oldest at top."""
-    conn = sqlite3.connect(DB_PATH)
-    c = conn.cursor()
-    c.execute(
-        "SELECT p.from_id, fu.name, p.to_id, tu.name, p.reason, p.comment, p.created_at FROM pluses p JOIN users fu ON fu.id = p.from_id JOIN users tu ON tu.id = p.to_id ORDER BY p.created_at DESC LIMIT ?",
-        (limit,),
-    )
-    rows = c.fetchall()
-    conn.close()
-    # Reverse to show oldest first (from the 100 most recent)
-    return list(reversed(rows))
+def get_pluses_page(
+    cursor_id: int | None = None,
+    direction: str = "older",
+    limit: int = 10,
+) -> tuple[list[tuple[int, str, str, str, str | None, str]], bool, bool]:
+    """Return one page of all pluses, newest first, and (has_newer, has_older).
+
+    Rows are (id, from_name, to_name, reason, comment, created_at). Keyset
+    pagination over (created_at, id): `cursor_id` is the last plus of the
+    previous page (direction "older") or the first plus of the next page
+    ("newer"), so every page costs the same however deep the history is.
+    """
+    select = f"""
+        SELECT p.id, fu.name, tu.name, {REASON_TITLE_SQL}, p.comment, p.created_at
+        FROM pluses p
+        JOIN reasons r ON r.id = p.reason_id
+        JOIN users fu ON fu.id = p.from_id
+        JOIN users tu ON tu.id = p.to_id
+    """
+    with get_connection() as conn:
+        c = conn.cursor()
+        cursor_at = None
+        if cursor_id is not None:
+            c.execute("SELECT created_at FROM pluses WHERE id = ?", (cursor_id,))
+            row = c.fetchone()
+            if row:
+                cursor_at = row[0]
+
+        if cursor_at is None:
+            c.execute(select + " ORDER BY p.created_at DESC, p.id DESC LIMIT ?", (limit + 1,))
+            rows = c.fetchall()
+            return rows[:limit], False, len(rows) > limit
+
+        if direction == "newer":
+            c.execute(
+                select + " WHERE (p.created_at, p.id) > (?, ?) ORDER BY p.created_at, p.id LIMIT ?",
+                (cursor_at, cursor_id, limit + 1),
+            )
+            rows = c.fetchall()
+            return rows[:limit][::-1], len(rows) > limit, True
+
+        c.execute(
+            select + " WHERE (p.created_at, p.id) < (?, ?) ORDER BY p.created_at DESC, p.id DESC LIMIT ?",
+            (cursor_at, cursor_id, limit + 1),
+        )
+        rows = c.fetchall()
+    return rows[:limit], True, len(rows) > limit
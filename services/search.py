@@ -0,0 +1,149 @@
+# -*- coding: utf-8 -*-
+
+import heapq
+import threading
+from collections import defaultdict
+
+from db import get_connection
+
+
+def _fold(text: str) -> str:
+    return text.casefold().replace("ё", "е")
+
+
+def _trigrams(text: str) -> set[str]:
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+
+class UserIndex:
+    """In-memory name index for incremental user search.
+
+    Short queries (1-2 chars) are matched against word prefixes, longer ones
+    also through a trigram index and then checked as substrings. Results are
+    ranked: name starts with the query, then a word starts with it, then the
+    query occurs anywhere in the name. Each rank has its own index and the
+    next rank is looked at only while the page is not full.
+    """
+
+    def __init__(self):
+        self._names = {}  # user_id -> (name, folded name, its words)
+        self._starts = defaultdict(set)  # 1-3 first chars of the folded name -> user ids
+        self._prefixes = defaultdict(set)  # 1-3 first chars of a word -> user ids
+        self._trigrams = defaultdict(set)  # trigram of the folded name -> user ids
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _keys(folded: str, words: list[str]):
+        starts = {folded[:n] for n in (1, 2, 3)}
+        prefixes = {word[:n] for word in words for n in (1, 2, 3)}
+        return starts, prefixes, _trigrams(folded)
+
+    def _indexes(self):
+        return self._starts, self._prefixes, self._trigrams
+
+    def add(self, user_id: int, name: str):
+        with self._lock:
+            self._remove(user_id)
+            folded = _fold(name)
+            words = folded.split()
+            self._names[user_id] = (name, folded, words)
+            for index, keys in zip(self._indexes(), self._keys(folded, words)):
+                for key in keys:
+                    index[key].add(user_id)
+
+    def remove(self, user_id: int):
+        with self._lock:
+            self._remove(user_id)
+
+    def _remove(self, user_id: int):
+        entry = self._names.pop(user_id, None)
+        if entry is None:
+            return
+        for index, keys in zip(self._indexes(), self._keys(entry[1], entry[2])):
+            for key in keys:
+                ids = index.get(key)
+                if ids is not None:
+                    ids.discard(user_id)
+                    if not ids:
+                        del index[key]
+
+    def _ranks(self, q: str):
+        # (кандидаты, проверка) для рангов 0, 1, 2; пересечение триграмм
+        # считается, только если до ранга 2 дошло дело
+        yield self._starts.get(q[:3], ()), lambda folded, words: folded.startswith(q)
+        yield self._prefixes.get(q[:3], ()), lambda folded, words: any(w.startswith(q) for w in words)
+        if len(q) >= 3:
+            sets = [self._trigrams.get(t) for t in _trigrams(q)]
+            if all(sets):
+                yield set.intersection(*sets), lambda folded, words: q in folded
+
+    def search(self, query: str, limit: int = 10, exclude_id: int | None = None) -> list[tuple[int, str]]:
+        q = _fold(query.strip())
+        if not q:
+            return []
+
+        results = []
+        with self._lock:
+            names = self._names
+            # Ранг смотрится, только если предыдущие не заполнили страницу,
+            # значит все их совпадения уже в results
+            skip = {exclude_id}
+            for candidates, matches in self._ranks(q):
+                if len(results) >= limit:
+                    break
+                hits = heapq.nsmallest(
+                    limit - len(results),
+                    (
+                        (folded, user_id, name)
+                        for user_id in candidates
+                        if user_id not in skip
+                        for name, folded, words in (names[user_id],)
+                        if matches(folded, words)
+                    ),
+                )
+                skip.update(user_id for _, user_id, _ in hits)
+                results.extend((user_id, name) for _, user_id, name in hits)
+        return results
+
+
+_index = UserIndex()
+_loaded = False
+_load_lock = threading.Lock()
+
+
+def _ensure_loaded():
+    global _loaded
+    if _loaded:
+        return
+    with _load_lock:
+        if _loaded:
+            return
+        with get_connection() as conn:
+            rows = conn.execute("SELECT id, name FROM users").fetchall()
+        for user_id, name in rows:
+            _index.add(user_id, name)
+        _loaded = True
+
+
+def warm_search_index():
+    """Build the search index now instead of on the first search."""
+    _ensure_loaded()
+
+
+def search_users(query: str, limit: int = 10, exclude_id: int | None = None) -> list[tuple[int, str]]:
+    """Return up to `limit` (user_id, name) pairs whose names match `query`, best first."""
+    _ensure_loaded()
+    return _index.search(query, limit=limit, exclude_id=exclude_id)
+
+
+def index_user(user_id: int, name: str):
+    """Add a new user to the search index (no-op until the index is first loaded)."""
+    with _load_lock:
+        if _loaded:
+            _index.add(user_id, name)
+
+
+def unindex_user(user_id: int):
+    with _load_lock:
+        if _loaded:
+            _index.remove(user_id)
@@ -1,60 +1,59 @@
 # -*- coding: utf-8 -*-
 
-import sqlite3
-from config import DB_PATH
-
-# Default seed catalog used on first run (key -> (name, price, stock_limit))
-DEFAULT_CATALOG = {
-    "stickerpack": ("Новогодний стикерпак", 3, None),
-    "big_sticker": ("Объёмный новогодний стикер", 1, None),
-    "mug": ("Новогодняя термокружка", 10, 25),
-    "pots": ("Набор горшков для зеленых друзей", 8, None),
-}
-
-
-def _ensure_seeded():
-    conn = sqlite3.connect(DB_PATH)
-    c = conn.cursor()
-    c.execute("SELECT COUNT(*) FROM shop_items")
-    count = c.fetchone()[0] or 0
-    if count == 0:
-        for key, (name, price, limit) in DEFAULT_CATALOG.items():
-            c.execute(
-                "INSERT OR IGNORE INTO shop_items (item_key, item_name, price, stock_limit) VALUES (?, ?, ?, ?)",
-                (key, name, price, limit),
-            )
-        conn.commit()
-    conn.close()
+from cache import TTLCache
+from config import CACHE_MAXSIZE, CACHE_TTL
+from db import get_connection, transaction
+from events import PLUS_GIVEN, PURCHASE_MADE, on, publish
+
+# user_id -> баланс и user_id -> список покупок; сбрасываются по событиям
+# PLUS_GIVEN / PURCHASE_MADE ниже
+_balance_cache = TTLCache(CACHE_MAXSIZE, CACHE_TTL)
+_purchases_cache = TTLCache(CACHE_MAXSIZE, CACHE_TTL)
+
+# Снимок каталога: единственный ключ "catalog" -> список
+# [(item_key, item_name, price, stock_limit, sold, remaining), ...]
+_catalog_cache = TTLCache(1, CACHE_TTL)
+
+
+def _load_catalog_snapshot() -> list[tuple[str, str, int, int | None, int, int | None]]:
+    # Продано берётся из shop_items.sold_count, который buy_item обновляет в
+    # той же транзакции, что и покупку, — GROUP BY по purchases не нужен
+    with get_connection() as conn:
+        c = conn.cursor()
+        c.execute(
+            "SELECT item_key, item_name, price, stock_limit, sold_count FROM shop_items ORDER BY item_name"
+        )
+        rows = c.fetchall()
+    return [
+        (key, name, price, limit, sold, None if limit is None else max(0, limit - sold))
+        for key, name, price, limit, sold in rows
+    ]
+
+
+def get_catalog_snapshot() -> list[tuple[str, str, int, int | None, int, int | None]]:
+    """Return the whole catalog with sold counts and remaining stock.
+
+    One cached query for every item, ordered by name:
+    (item_key, item_name, price, stock_limit, sold, remaining); remaining is
+    None for unlimited items.
+    """
+    return _catalog_cache.get_or_load("catalog", _load_catalog_snapshot)
+
+
+def invalidate_catalog():
+    _catalog_cache.clear()
 
 
 def get_catalog() -> dict:
-    _ensure_seeded()
-    conn = sqlite3.connect(DB_PATH)
-    c = conn.cursor()
-    c.execute("SELECT item_key, item_name, price, stock_limit FROM shop_items")
-    rows = c.fetchall()
-    conn.close()
-    return {row[0]: (row[1], row[2], row[3]) for row in rows}
+    return {key: (name, price, limit) for key, name, price, limit, _, _ in get_catalog_snapshot()}
 
 
 def get_remaining_stock(item_key: str) -> int | None:
     """Get remaining stock for an item. Returns None if unlimited."""
-    _ensure_seeded()
-    conn = sqlite3.connect(DB_PATH)
-    c = conn.cursor()
-    c.execute("SELECT stock_limit FROM shop_items WHERE item_key = ?", (item_key,))
-    row = c.fetchone()
-    if not row:
-        conn.close()
-        return None
-    limit = row[0]
-    if limit is None:
-        conn.close()
-        return None
-    c.execute("SELECT COUNT(*) FROM purchases WHERE item_key = ?", (item_key,))
-    sold = c.fetchone()[0] or 0
-    conn.close()
-    return max(0, limit - sold)
+    for key, _, _, _, _, remaining in get_catalog_snapshot():
+        if key == item_key:
+            return remaining
+    return None
 
 
 def is_in_stock(item_key: str) -> bool:
@@ -65,119 +64,183 @@ def is_in_stock(item_key: str) -> bool:
     return remaining > 0
 
 
+def _load_balance(user_id: int) -> int:
+    with get_connection() as conn:
+        c = conn.cursor()
+        c.execute("SELECT received - spent FROM balances WHERE user_id = ?", (user_id,))
+        row = c.fetchone()
+    return row[0] if row else 0
+
+
 def get_balance(user_id: int) -> int:
-    """Calculate user's balance: received pluses minus spent pluses."""
-    _ensure_seeded()
-    conn = sqlite3.connect(DB_PATH)
-    c = conn.cursor()
-    c.execute("SELECT COUNT(*) FROM pluses WHERE to_id = ?", (user_id,))
-    received = c.fetchone()[0] or 0
-    c.execute("SELECT COALESCE(SUM(price),0) FROM purchases WHERE user_id = ?", (user_id,))
-    spent = c.fetchone()[0] or 0
-    conn.close()
-    return received - spent
+    """User's balance (received pluses minus spent) from the balances ledger."""
+    return _balance_cache.get_or_load(user_id, lambda: _load_balance(user_id))
+
+
+def _load_all_balances() -> list[tuple[int, int]]:
+    with get_connection() as conn:
+        rows = conn.execute(
+            "SELECT u.id, COALESCE(b.received - b.spent, 0) FROM users u LEFT JOIN balances b ON b.user_id = u.id"
+        ).fetchall()
+    return rows
+
+
+def warm_shop_cache() -> int:
+    """Pre-load the catalog snapshot and every user's balance into the caches."""
+    get_catalog_snapshot()
+    return _balance_cache.load_many(_load_all_balances)
 
 
 def buy_item(user_id: int, item_key: str) -> tuple[bool, str]:
-    """Attempt to buy an item. Returns (success, message)."""
-    catalog = get_catalog()
-    if item_key not in catalog:
-        return False, "Товар не найден."
-
-    name, price, _ = catalog[item_key]
-
-    # Check stock
-    if not is_in_stock(item_key):
-        return False, f"{name} — закончился товар."
-
-    balance = get_balance(user_id)
-    if balance < price:
-        return False, f"Недостаточно плюсов — нужно {price}, у тебя {balance}."
-
-    conn = sqlite3.connect(DB_PATH)
-    c = conn.cursor()
-    c.execute(
-        "INSERT INTO purchases (user_id, item_key, item_name, price) VALUES (?, ?, ?, ?)",
-        (user_id, item_key, name, price),
-    )
-    conn.commit()
-    conn.close()
-    return True, f"Куплено: {name} за {price} плюсов. Остаток: {balance - price}."
+    """Attempt to buy an item. Returns (success, message).
+
+    Stock and balance are checked and updated in one BEGIN IMMEDIATE
+    transaction, so concurrent buyers can't oversell a limited item or
+    spend the same pluses twice.
+    """
+    with transaction(immediate=True) as conn:
+        c = conn.cursor()
+        c.execute(
+            "SELECT item_name, price, stock_limit, sold_count FROM shop_items WHERE item_key = ?",
+            (item_key,),
+        )
+        row = c.fetchone()
+        if not row:
+            return False, "Товар не найден."
 
+        name, price, limit, sold = row
 
-def get_user_purchases(user_id: int) -> list[tuple[str, int, str]]:
-    """Get all purchases for a user. Returns list of (item_name, price, created_at)."""
-    _ensure_seeded()
-    conn = sqlite3.connect(DB_PATH)
-    c = conn.cursor()
-    c.execute(
-        "SELECT item_name, price, created_at FROM purchases WHERE user_id = ? ORDER BY created_at DESC",
-        (user_id,),
-    )
-    rows = c.fetchall()
-    conn.close()
-    return rows
+        # Check stock
+        if limit is not None and sold >= limit:
+            return False, f"{name} — закончился товар."
 
+        c.execute("SELECT received - spent FROM balances WHERE user_id = ?", (user_id,))
+        row = c.fetchone()
+        balance = row[0] if row else 0
+        if balance < price:
+            return False, f"Недостаточно плюсов — нужно {price}, у тебя {balance}."
 
-def get_all_items() -> list[tuple[str, str, int, int | None]]:
-    """Get all shop items. Returns list of (item_key, item_name, price, stock_limit)."""
-    _ensure_seeded()
-    conn = sqlite3.connect(DB_PATH)
-    c = conn.cursor()
-    c.execute("SELECT item_key, item_name, price, stock_limit FROM shop_items ORDER BY item_name")
-    rows = c.fetchall()
-    conn.close()
-    return rows
+        c.execute(
+            "UPDATE shop_items SET sold_count = sold_count + 1 WHERE item_key = ?",
+            (item_key,),
+        )
+        c.execute(
+            """
+            INSERT INTO balances (user_id, spent) VALUES (?, ?)
+            ON CONFLICT(user_id) DO UPDATE SET spent = spent + excluded.spent
+            """,
+            (user_id, price),
+        )
+        c.execute(
+            "INSERT INTO purchases (user_id, item_key, item_name, price) VALUES (?, ?, ?, ?)",
+            (user_id, item_key, name, price),
+        )
+    invalidate_catalog()
+    publish(PURCHASE_MADE, user_id=user_id, item_key=item_key)
+    return True, f"Куплено: {name} за {price} плюсов. Остаток: {balance - price}."
 
 
-def get_recent_purchases(limit: int = 100) -> list[tuple[int, str, str, int, str]]:
-    """Return list of recent purchases: (user_id, user_name, item_name, price, created_at)"""
-    _ensure_seeded()
-    conn = sqlite3.connect(DB_PATH)
-    c = conn.cursor()
-    c.execute(
-        "SELECT p.user_id, u.name, p.item_name, p.price, p.created_at FROM purchases p JOIN users u ON u.id = p.user_id ORDER BY p.created_at LIMIT ?",
-        (limit,),
-    )
-    rows = c.fetchall()
-    conn.close()
+def _load_user_purchases(user_id: int) -> list[tuple[str, int, str]]:
+    with get_connection() as conn:
+        c = conn.cursor()
+        c.execute(
+            "SELECT item_name, price, created_at FROM purchases WHERE user_id = ? ORDER BY created_at DESC",
+            (user_id,),
+        )
+        rows = c.fetchall()
     return rows
 
 
+def get_user_purchases(user_id: int) -> list[tuple[str, int, str]]:
+    """Get all purchases for a user. Returns list of (item_name, price, created_at)."""
+    return _purchases_cache.get_or_load(user_id, lambda: _load_user_purchases(user_id))
+
+
+@on(PLUS_GIVEN)
+def _on_plus_given(from_id: int, to_id: int):
+    _balance_cache.invalidate(to_id)
+
+
+@on(PURCHASE_MADE)
+def _on_purchase_made(user_id: int, item_key: str):
+    _balance_cache.invalidate(user_id)
+    _purchases_cache.invalidate(user_id)
+
+
+def get_purchases_page(
+    cursor_id: int | None = None,
+    direction: str = "older",
+    limit: int = 10,
+) -> tuple[list[tuple[int, str, str, int, str]], bool, bool]:
+    """Return one page of all purchases, newest first, and (has_newer, has_older).
+
+    Rows are (id, user_name, item_name, price, created_at); keyset
+    pagination over (created_at, id) as in services.pluses.get_pluses_page.
+    """
+    select = """
+        SELECT p.id, u.name, p.item_name, p.price, p.created_at
+        FROM purchases p
+        JOIN users u ON u.id = p.user_id
+    """
+    with get_connection() as conn:
+        c = conn.cursor()
+        cursor_at = None
+        if cursor_id is not None:
+            c.execute("SELECT created_at FROM purchases WHERE id = ?", (cursor_id,))
+            row = c.fetchone()
+            if row:
+                cursor_at = row[0]
+
+        if cursor_at is None:
+            c.execute(select + " ORDER BY p.created_at DESC, p.id DESC LIMIT ?", (limit + 1,))
+            rows = c.fetchall()
+            return rows[:limit], False, len(rows) > limit
+
+        if direction == "newer":
+            c.execute(
+                select + " WHERE (p.created_at, p.id) > (?, ?) ORDER BY p.created_at, p.id LIMIT ?",
+                (cursor_at, cursor_id, limit + 1),
+            )
+            rows = c.fetchall()
+            return rows[:limit][::-1], len(rows) > limit, True
+
+        c.execute(
+            select + " WHERE (p.created_at, p.id) < (?, ?) ORDER BY p.created_at DESC, p.id DESC LIMIT ?",
+            (cursor_at, cursor_id, limit + 1),
+        )
+        rows = c.fetchall()
+    return rows[:limit], True, len(rows) > limit
+
+
 def add_item(item_key: str, item_name: str, price: int, stock_limit: int | None) -> tuple[bool, str]:
     """Add or update a shop item. Returns (success, message)."""
-    _ensure_seeded()
-    conn = sqlite3.connect(DB_PATH)
-    c = conn.cursor()
     try:
-        c.execute(
-            "INSERT INTO shop_items (item_key, item_name, price, stock_limit) VALUES (?, ?, ?, ?) ON CONFLICT(item_key) DO UPDATE SET item_name=excluded.item_name, price=excluded.price, stock_limit=excluded.stock_limit",
-            (item_key, item_name, price, stock_limit),
-        )
-        conn.commit()
+        with transaction() as conn:
+            # A re-added key keeps counting the purchases made under it before
+            conn.execute(
+                "INSERT INTO shop_items (item_key, item_name, price, stock_limit, sold_count) VALUES (?, ?, ?, ?, (SELECT COUNT(*) FROM purchases WHERE item_key = ?)) ON CONFLICT(item_key) DO UPDATE SET item_name=excluded.item_name, price=excluded.price, stock_limit=excluded.stock_limit",
+                (item_key, item_name, price, stock_limit, item_key),
+            )
     except Exception as e:
-        conn.close()
         return False, f"Ошибка при добавлении товара: {e}"
-    conn.close()
+    finally:
+        invalidate_catalog()
     return True, f"Товар '{item_name}' ({item_key}) добавлен или обновлён."
 
 
 def remove_item(item_key: str) -> tuple[bool, str]:
     """Remove a shop item by key. Returns (success, message)."""
-    _ensure_seeded()
-    conn = sqlite3.connect(DB_PATH)
-    c = conn.cursor()
-    c.execute("SELECT item_name FROM shop_items WHERE item_key = ?", (item_key,))
-    row = c.fetchone()
-    if not row:
-        conn.close()
-        return False, "Товар не найден."
-    item_name = row[0]
     try:
-        c.execute("DELETE FROM shop_items WHERE item_key = ?", (item_key,))
-        conn.commit()
+        with transaction() as conn:
+            c = conn.cursor()
+            c.execute("SELECT item_name FROM shop_items WHERE item_key = ?", (item_key,))
+            row = c.fetchone()
+            if not row:
+                return False, "Товар не найден."
+            item_name = row[0]
+            c.execute("DELETE FROM shop_items WHERE item_key = ?", (item_key,))
     except Exception as e:
-        conn.close()
         return False, f"Ошибка при удалении товара: {e}"
-    conn.close()
+    finally:
+        invalidate_catalog()
     return True, f"Товар '{item_name}' ({item_key}) удалён."
@@ -0,0 +1,141 @@
+# -*- coding: utf-8 -*-
+
+import threading
+
+from cache import TTLCache
+from config import CACHE_MAXSIZE, CACHE_TTL
+from db import get_connection
+from events import PLUS_GIVEN, PURCHASE_MADE, on
+from services.pluses import REASON_TITLE_SQL
+
+# Бюджет страницы в UTF-16 (лимит Telegram — 4096 на сообщение)
+PAGE_BUDGET = 3500
+# Длинные причины "Другое: ..." и комментарии обрезаются до этой длины
+FIELD_LIMIT = 300
+
+# (user_id, version, direction, cursor_id) -> страница, см. get_status_page
+_status_cache = TTLCache(CACHE_MAXSIZE, CACHE_TTL)
+# user_id -> версия; растёт при каждом изменении плюсиков/баланса пользователя,
+# так что старые страницы просто перестают находиться и вытесняются LRU
+_versions = {}
+_versions_lock = threading.Lock()
+
+
+def _utf16_len(s: str) -> int:
+    return len(s.encode("utf-16-le")) // 2
+
+
+def _clip(text: str) -> str:
+    return text if len(text) <= FIELD_LIMIT else text[:FIELD_LIMIT - 1] + "…"
+
+
+def _render_entry(reason: str, comment: str | None, name: str) -> str:
+    text = f"➕ {_clip(reason)} — от {name}"
+    if comment:
+        text += f"\n   💬 {_clip(comment)}"
+    return text + "\n"
+
+
+def _load_page(user_id: int, direction: str, cursor_id: int | None):
+    with get_connection() as conn:
+        c = conn.cursor()
+        c.execute("SELECT received, received - spent FROM balances WHERE user_id = ?", (user_id,))
+        received, balance = c.fetchone() or (0, 0)
+        if not received:
+            return "У тебя пока нет плюсиков 🙂", [], None, None, False, False
+
+        cursor_at = None
+        if cursor_id is not None:
+            c.execute("SELECT created_at FROM pluses WHERE id = ? AND to_id = ?", (cursor_id, user_id))
+            row = c.fetchone()
+            if row:
+                cursor_at = row[0]
+
+        select = f"""
+            SELECT p.id, {REASON_TITLE_SQL}, p.comment, u.name
+            FROM pluses p
+            JOIN reasons r ON r.id = p.reason_id
+            JOIN users u ON u.id = p.from_id
+            WHERE p.to_id = ?
+        """
+        if cursor_at is None:
+            direction = "older"
+            c.execute(select + " ORDER BY p.created_at DESC, p.id DESC", (user_id,))
+        elif direction == "newer":
+            c.execute(
+                select + " AND (p.created_at, p.id) > (?, ?) ORDER BY p.created_at, p.id",
+                (user_id, cursor_at, cursor_id),
+            )
+        else:
+            c.execute(
+                select + " AND (p.created_at, p.id) < (?, ?) ORDER BY p.created_at DESC, p.id DESC",
+                (user_id, cursor_at, cursor_id),
+            )
+
+        # Строки читаются с курсора, пока помещаются в бюджет страницы,
+        # длина каждой считается один раз
+        header = f"🌟 Твои плюсики ({balance}/{received}):\n"
+        used = _utf16_len(header)
+        entries = []  # (id, text, utf16 length)
+        more = False
+        for plus_id, reason, comment, name in c:
+            text = _render_entry(reason, comment, name)
+            length = _utf16_len(text)
+            if entries and used + length > PAGE_BUDGET:
+                more = True
+                break
+            entries.append((plus_id, text, length))
+            used += length
+        c.close()
+
+    if direction == "newer":
+        entries.reverse()
+        has_newer, has_older = more, True
+    else:
+        has_newer, has_older = cursor_at is not None, more
+
+    # Смещения эмодзи ➕ в начале каждой записи — нарастающим итогом
+    parts = [header]
+    emoji_offsets = []
+    offset = _utf16_len(header)
+    for _, text, length in entries:
+        emoji_offsets.append(offset)
+        parts.append(text)
+        offset += length
+
+    first_id = entries[0][0] if entries else None
+    last_id = entries[-1][0] if entries else None
+    return "".join(parts), emoji_offsets, first_id, last_id, has_newer, has_older
+
+
+def get_status_page(user_id: int, direction: str = "older", cursor_id: int | None = None):
+    """Return one page of the "my status" screen: pluses received, newest first.
+
+    Result: (text, emoji_offsets, first_id, last_id, has_newer, has_older).
+    `emoji_offsets` are UTF-16 offsets of the ➕ opening each entry (one code
+    unit long), ready for custom emoji entities. A page holds as many entries
+    as fit in PAGE_BUDGET UTF-16 units, so it always fits in one message.
+    Keyset navigation as in services.pluses.get_pluses_page. Pages are cached
+    until invalidate_status(user_id).
+    """
+    version = _versions.get(user_id, 0)
+    return _status_cache.get_or_load(
+        (user_id, version, direction, cursor_id),
+        lambda: _load_page(user_id, direction, cursor_id),
+    )
+
+
+def invalidate_status(user_id: int):
+    """Drop cached status pages of a user."""
+    with _versions_lock:
+        _versions[user_id] = _versions.get(user_id, 0) + 1
+
+
+@on(PLUS_GIVEN)
+def _on_plus_given(from_id: int, to_id: int):
+    invalidate_status(to_id)
+
+
+@on(PURCHASE_MADE)
+def _on_purchase_made(user_id: int, item_key: str):
+    invalidate_status(user_id)  # баланс в заголовке
@@ -1,55 +1,156 @@
 # -*- coding: utf-8 -*-
 
-import sqlite3
-from config import DB_PATH
+import threading
 
+from cache import TTLCache
+from config import CACHE_MAXSIZE, CACHE_TTL
+from db import get_connection, transaction
+from services.bindings import invalidate_binding
+from services.search import index_user, unindex_user
 
-def get_all_users():
-    conn = sqlite3.connect(DB_PATH)
-    c = conn.cursor()
-    c.execute("SELECT id, name FROM users ORDER BY name")
-    rows = c.fetchall()
-    conn.close()
-    return rows
+# user_id -> (name, is_admin) или None, если пользователя нет
+_users_cache = TTLCache(CACHE_MAXSIZE, CACHE_TTL)
+
+# Версия списка пользователей: растёт при добавлении и удалении, по ней
+# ui кэширует клавиатуры страниц
+_users_version = 0
+_version_lock = threading.Lock()
+
+
+def users_version() -> int:
+    return _users_version
+
+
+def _bump_version():
+    global _users_version
+    with _version_lock:
+        _users_version += 1
+
+
+def get_users_page(
+    cursor_id: int | None = None,
+    direction: str = "next",
+    exclude_id: int | None = None,
+    limit: int = 10,
+) -> tuple[list[tuple[int, str]], bool, bool]:
+    """Return one page of users ordered by (name, id) and (has_prev, has_next).
+
+    Keyset pagination: `cursor_id` is the last user of the previous page
+    (direction "next") or the first user of the next page ("prev"). Each
+    page is one indexed LIMIT query plus a one-row probe for more rows.
+    """
+    with get_connection() as conn:
+        c = conn.cursor()
+        cursor_name = None
+        if cursor_id is not None:
+            c.execute("SELECT name FROM users WHERE id = ?", (cursor_id,))
+            row = c.fetchone()
+            if row:
+                cursor_name = row[0]
+
+        if cursor_name is None:
+            # Первая страница (или курсор указывает на удалённого пользователя)
+            c.execute(
+                "SELECT id, name FROM users WHERE (? IS NULL OR id != ?) ORDER BY name, id LIMIT ?",
+                (exclude_id, exclude_id, limit + 1),
+            )
+            rows = c.fetchall()
+            return rows[:limit], False, len(rows) > limit
+
+        if direction == "prev":
+            c.execute(
+                "SELECT id, name FROM users WHERE (name, id) < (?, ?) AND (? IS NULL OR id != ?) ORDER BY name DESC, id DESC LIMIT ?",
+                (cursor_name, cursor_id, exclude_id, exclude_id, limit + 1),
+            )
+            rows = c.fetchall()
+            return rows[:limit][::-1], len(rows) > limit, True
+
+        c.execute(
+            "SELECT id, name FROM users WHERE (name, id) > (?, ?) AND (? IS NULL OR id != ?) ORDER BY name, id LIMIT ?",
+            (cursor_name, cursor_id, exclude_id, exclude_id, limit + 1),
+        )
+        rows = c.fetchall()
+    return rows[:limit], True, len(rows) > limit
+
+
+def _load_user(user_id: int):
+    with get_connection() as conn:
+        c = conn.cursor()
+        c.execute("SELECT name, is_admin FROM users WHERE id = ?", (user_id,))
+        row = c.fetchone()
+    return (row[0], bool(row[1])) if row else None
+
+
+def _get_user(user_id: int):
+    return _users_cache.get_or_load(user_id, lambda: _load_user(user_id))
 
 
 def get_user_name(user_id: int) -> str | None:
-    conn = sqlite3.connect(DB_PATH)
-    c = conn.cursor()
-    c.execute("SELECT name FROM users WHERE id = ?", (user_id,))
-    row = c.fetchone()
-    conn.close()
-    return row[0] if row else None
+    user = _get_user(user_id)
+    return user[0] if user else None
 
 def is_admin(user_id: int) -> bool:
     """Check if user is an administrator."""
-    conn = sqlite3.connect(DB_PATH)
-    c = conn.cursor()
-    c.execute("SELECT is_admin FROM users WHERE id = ?", (user_id,))
-    row = c.fetchone()
-    conn.close()
-    return bool(row and row[0])
+    user = _get_user(user_id)
+    return bool(user and user[1])
 
 
 def add_user(name: str, is_admin_flag: bool = False) -> int:
     """Add a new user and return their ID."""
-    conn = sqlite3.connect(DB_PATH)
-    c = conn.cursor()
-    c.execute(
-        "INSERT INTO users (name, is_admin) VALUES (?, ?)",
-        (name, 1 if is_admin_flag else 0),
-    )
-    conn.commit()
-    user_id = c.lastrowid
-    conn.close()
+    with transaction() as conn:
+        c = conn.cursor()
+        c.execute(
+            "INSERT INTO users (name, is_admin) VALUES (?, ?)",
+            (name, 1 if is_admin_flag else 0),
+        )
+        user_id = c.lastrowid
+    _users_cache.invalidate(user_id)
+    _bump_version()
+    index_user(user_id, name)
     return user_id
 
 
 def user_exists(name: str) -> bool:
     """Check if a user with this name already exists."""
-    conn = sqlite3.connect(DB_PATH)
-    c = conn.cursor()
-    c.execute("SELECT id FROM users WHERE name = ?", (name,))
-    row = c.fetchone()
-    conn.close()
-    return bool(row)
\ No newline at end of file
+    with get_connection() as conn:
+        c = conn.cursor()
+        c.execute("SELECT id FROM users WHERE name = ?", (name,))
+        row = c.fetchone()
+    return bool(row)
+
+
+def delete_user(user_id: int) -> list[int]:
+    """Delete a user together with their Telegram binding.
+
+    Returns the telegram ids that were bound to the user.
+    """
+    with transaction() as conn:
+        c = conn.cursor()
+        c.execute("SELECT telegram_id FROM telegram_bindings WHERE user_id = ?", (user_id,))
+        telegram_ids = [row[0] for row in c.fetchall()]
+        # Удаляем привязку если есть
+        c.execute("DELETE FROM telegram_bindings WHERE user_id = ?", (user_id,))
+        # Удаляем самого пользователя
+        c.execute("DELETE FROM users WHERE id = ?", (user_id,))
+
+    _users_cache.invalidate(user_id)
+    _bump_version()
+    unindex_user(user_id)
+    for telegram_id in telegram_ids:
+        invalidate_binding(telegram_id)
+    return telegram_ids
+
+
+def _load_all_user_entries():
+    with get_connection() as conn:
+        rows = conn.execute("SELECT id, name, is_admin FROM users").fetchall()
+    return [(user_id, (name, bool(admin))) for user_id, name, admin in rows]
+
+
+def warm_users_cache() -> int:
+    """Pre-load every user into the users cache."""
+    return _users_cache.load_many(_load_all_user_entries)
+
+
+def cache_stats() -> dict:
+    return {"users": _users_cache.stats()}
@@ -0,0 +1,43 @@
+# -*- coding: utf-8 -*-
+
+import os
+import sys
+import tempfile
+
+import pytest
+
+# config читает окружение при импорте: тесты работают с временной базой
+os.environ["DB_PATH"] = os.path.join(tempfile.mkdtemp(), "test.db")
+os.environ.setdefault("BOT_TOKEN", "test")
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+@pytest.fixture(scope="session", autouse=True)
+def database():
+    from db import close_pool, init_db
+
+    init_db()
+    yield
+    close_pool()
+
+
+@pytest.fixture
+def traced(monkeypatch):
+    """Record every statement the services run, with parameters expanded."""
+    import db
+
+    statements = []
+    acquire, release = db._acquire, db._release
+
+    def traced_acquire():
+        conn = acquire()
+        conn.set_trace_callback(statements.append)
+        return conn
+
+    def traced_release(conn):
+        conn.set_trace_callback(None)
+        release(conn)
+
+    monkeypatch.setattr(db, "_acquire", traced_acquire)
+    monkeypatch.setattr(db, "_release", traced_release)
+    return statements
@@ -0,0 +1,25 @@
+# -*- coding: utf-8 -*-
+
+import asyncio
+from types import SimpleNamespace
+from unittest.mock import AsyncMock
+
+from handlers.callbacks import callbacks
+
+
+def _press(data: str, user_data: dict):
+    query = SimpleNamespace(data=data, answer=AsyncMock())
+    asyncio.run(callbacks(SimpleNamespace(callback_query=query), SimpleNamespace(user_data=user_data)))
+
+
+def test_leaving_the_picker_ends_user_search():
+    # Кнопки без обработчика: проверяется только сброс флага перед dispatch
+    user_data = {"user_search": "choose_user"}
+    _press("choose_user:unknown:1", user_data)
+    assert user_data == {"user_search": "choose_user"}
+
+    _press("delete_user:unknown:1", user_data)
+    assert user_data == {"user_search": "choose_user"}
+
+    _press("unknown_menu_button", user_data)
+    assert user_data == {}
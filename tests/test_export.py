@@ -0,0 +1,57 @@
+# -*- coding: utf-8 -*-
+
+import csv
+import io
+
+import services.export as export
+from db import transaction
+from services.pluses import save_plus
+from services.users import add_user
+
+DAYS = ["2001-01-01", "2001-01-15", "2001-02-01", "2001-02-15", "2001-03-01"]
+
+
+def _seed():
+    giver = add_user("Выгрузка Даритель")
+    receiver = add_user("Выгрузка Получатель")
+    for day in DAYS:
+        save_plus(giver, receiver, "other", day, "x" * 200)
+    with transaction() as conn:
+        conn.execute(
+            "UPDATE pluses SET created_at = substr(reason_text, -10) || ' 12:00:00' WHERE to_id = ?",
+            (receiver,),
+        )
+
+
+def _read(out) -> tuple[bytes, list[list[str]]]:
+    data = out.read()
+    out.close()
+    return data, list(csv.reader(io.StringIO(data.decode("utf-8-sig"), newline="")))
+
+
+def test_export_range_header_and_spooling(monkeypatch):
+    _seed()
+
+    out, count = export.export_csv("pluses", "2001-01-15", "2001-03-01")
+    assert not out._rolled
+    data, rows = _read(out)
+    assert data.startswith(b"\xef\xbb\xbf")
+    assert rows[0] == export.EXPORTS["pluses"][0]
+    assert count == len(rows) - 1 == 3
+    assert [row[1] for row in rows[1:]] == [f"{day} 12:00:00" for day in DAYS[1:4]]
+    assert {row[7] for row in rows[1:]} == {f"Другое: {day}" for day in DAYS[1:4]}
+
+    monkeypatch.setattr(export, "SPOOL_MAX_SIZE", 512)
+    out, count = export.export_csv("pluses", "2001-01-01", "2001-04-01")
+    assert out._rolled
+    data, rows = _read(out)
+    assert count == len(rows) - 1 == len(DAYS)
+
+
+def test_period_bounds():
+    today = export.date(2024, 5, 20)
+    assert export.period_bounds("all", today) == (None, None)
+    assert export.period_bounds("30d", today) == ("2024-04-20", None)
+    assert export.period_bounds("quarter", today) == ("2024-04-01", None)
+    assert export.period_bounds("prev_quarter", today) == ("2024-01-01", "2024-04-01")
+    assert export.period_bounds("prev_quarter", export.date(2024, 2, 1)) == ("2023-10-01", "2024-01-01")
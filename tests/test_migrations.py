@@ -0,0 +1,82 @@
+# -*- coding: utf-8 -*-
+
+import os
+
+import pytest
+
+import db
+from constants import REASONS
+from services.pluses import REASON_TITLE_SQL, save_plus
+
+# Причины в том виде, в каком их писали версии бота до кодов причин
+LEGACY_PLUSES = [
+    (1, REASONS["advice"], "2024-01-01 10:00:00"),
+    (2, "Другое: За помощь с переездом", "2024-01-03 10:00:00"),
+    (3, "За заботу о растениях", "2024-01-09 10:00:00"),
+    (4, REASONS["other"], "2024-01-10 10:00:00"),
+    (7, REASONS["sport"], "2024-02-20 10:00:00"),
+]
+
+
+@pytest.fixture
+def fresh_db(tmp_path, monkeypatch):
+    """Run db functions against an empty database file of their own."""
+    monkeypatch.setattr(db, "DB_PATH", os.path.join(tmp_path, "legacy.db"))
+    conn = db._connect()
+    monkeypatch.setattr(db, "_acquire", lambda: conn)
+    monkeypatch.setattr(db, "_release", lambda c: c.rollback() if c.in_transaction else None)
+    yield conn
+    conn.close()
+
+
+def _rollups(c):
+    return (
+        c.execute("SELECT * FROM plus_daily ORDER BY 1, 2").fetchall(),
+        c.execute("SELECT * FROM plus_weekly ORDER BY 1, 2").fetchall(),
+    )
+
+
+def test_reason_codes_migration(fresh_db, monkeypatch):
+    c = fresh_db.cursor()
+    migrations = db.MIGRATIONS
+    # База в состоянии до миграции 10: справочника reasons ещё нет
+    with monkeypatch.context() as m:
+        m.setattr(db, "MIGRATIONS", [entry for entry in migrations if entry[0] < 10])
+        m.setattr(db, "_sync_reasons", lambda c: None)
+        db.init_db()
+
+    with fresh_db:
+        c.execute("INSERT INTO users (id, name) VALUES (1, 'A'), (2, 'B')")
+        c.executemany(
+            "INSERT INTO pluses (id, from_id, to_id, reason, created_at) VALUES (?, 1, 2, ?, ?)",
+            LEGACY_PLUSES,
+        )
+        # Удалённый последний плюсик: его id не должен достаться новому
+        c.execute("INSERT INTO pluses (id, from_id, to_id, reason) VALUES (9, 1, 2, 'x')")
+        c.execute("DELETE FROM pluses WHERE id = 9")
+
+    db.init_db()
+
+    c.execute(f"""
+        SELECT p.id, r.key, p.reason_text, {REASON_TITLE_SQL}
+        FROM pluses p JOIN reasons r ON r.id = p.reason_id ORDER BY p.id
+    """)
+    assert c.fetchall() == [
+        (1, "advice", None, REASONS["advice"]),
+        (2, "other", "Другое: За помощь с переездом", "Другое: За помощь с переездом"),
+        (3, "other", "За заботу о растениях", "За заботу о растениях"),
+        (4, "other", None, REASONS["other"]),
+        (7, "sport", None, REASONS["sport"]),
+    ]
+    assert c.execute("SELECT seq FROM sqlite_sequence WHERE name = 'pluses'").fetchone() == (9,)
+
+    save_plus(1, 2, "other", "новая причина", None)
+    save_plus(2, 1, "advice", None, None)
+    c.execute(f"SELECT p.id, {REASON_TITLE_SQL} FROM pluses p JOIN reasons r ON r.id = p.reason_id WHERE p.id > 9")
+    assert c.fetchall() == [(10, "Другое: новая причина"), (11, REASONS["advice"])]
+
+    assert db.roll_up_pluses() == 2
+    incremental = _rollups(c)
+    db.rebuild_rollups()
+    assert _rollups(c) == incremental
+    assert sum(count for _, _, count in incremental[0]) == len(LEGACY_PLUSES) + 2
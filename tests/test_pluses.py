@@ -0,0 +1,34 @@
+# -*- coding: utf-8 -*-
+
+import asyncio
+import sqlite3
+
+import services.pluses as pluses
+from db import get_connection
+from services.users import add_user
+
+
+def test_failed_batch_is_retried_row_by_row(monkeypatch):
+    giver = add_user("Пакет Даритель")
+    receiver = add_user("Пакет Получатель")
+    rows = [(giver, receiver, "other", str(i), None) for i in range(5)]
+    rows[2] = (None, receiver, "other", "bad", None)  # from_id NOT NULL
+
+    single_calls = []
+    save_plus = pluses.save_plus
+    monkeypatch.setattr(pluses, "save_plus", lambda *row: single_calls.append(row) or save_plus(*row))
+
+    async def submit_all():
+        queue = pluses.PlusWriteQueue(max_rows=len(rows), max_delay=1)
+        return await asyncio.gather(*(queue.submit(*row) for row in rows), return_exceptions=True)
+
+    results = asyncio.run(submit_all())
+
+    assert single_calls == rows
+    assert isinstance(results[2], sqlite3.IntegrityError)
+    assert results[:2] + results[3:] == [None] * 4
+    with get_connection() as conn:
+        saved = conn.execute("SELECT reason_text FROM pluses WHERE to_id = ? ORDER BY id", (receiver,)).fetchall()
+        balance = conn.execute("SELECT received FROM balances WHERE user_id = ?", (receiver,)).fetchone()
+    assert saved == [(f"Другое: {i}",) for i in (0, 1, 3, 4)]
+    assert balance == (4,)
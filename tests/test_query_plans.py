@@ -0,0 +1,77 @@
+# -*- coding: utf-8 -*-
+
+import pytest
+
+import db
+from services.pluses import get_pluses_given_by_user, get_pluses_page, save_plus
+from services.shop import buy_item, get_balance, get_purchases_page, get_user_purchases
+from services.status import get_status_page
+from services.users import add_user, get_users_page
+
+
+def _plans(statements):
+    with db.get_connection() as conn:
+        for sql in statements:
+            if not sql.lstrip().upper().startswith("SELECT"):
+                continue
+            plan = [row[3] for row in conn.execute("EXPLAIN QUERY PLAN " + sql)]
+            yield " ".join(sql.split()), plan
+
+
+def _assert_indexed(statements):
+    checked = 0
+    for sql, plan in _plans(statements):
+        checked += 1
+        for step in plan:
+            assert not step.startswith("SCAN"), f"{step}\n  in: {sql}"
+            assert "TEMP B-TREE" not in step, f"{step}\n  in: {sql}"
+    assert checked, "no queries were traced"
+
+
+@pytest.fixture
+def history():
+    giver = add_user("План Отправитель")
+    receiver = add_user("План Получатель")
+    for _ in range(15):
+        save_plus(giver, receiver, "other", "тест", "комментарий")
+    buy_item(receiver, "big_sticker")
+    buy_item(receiver, "big_sticker")
+    return giver, receiver
+
+
+def test_balance_and_stock(history, traced):
+    _, receiver = history
+    get_balance(receiver)
+    buy_item(receiver, "big_sticker")
+    _assert_indexed(traced)
+
+
+def test_status_pages(history, traced):
+    _, receiver = history
+    _, _, first_id, last_id, _, _ = get_status_page(receiver)
+    get_status_page(receiver, "older", last_id)
+    get_status_page(receiver, "newer", first_id)
+    _assert_indexed(traced)
+
+
+def test_user_history(history, traced):
+    giver, receiver = history
+    get_pluses_given_by_user(giver)
+    get_user_purchases(receiver)
+    _assert_indexed(traced)
+
+
+def test_keyset_pages(history, traced):
+    giver, receiver = history
+    plus_rows, _, _ = get_pluses_page(limit=5)
+    purchase_rows, _, _ = get_purchases_page(limit=1)
+    # Первая страница — обход индекса по порядку с LIMIT (SCAN ... USING
+    # INDEX), проверяются страницы от курсора
+    traced.clear()
+    get_pluses_page(plus_rows[-1][0], "older", limit=5)
+    get_pluses_page(plus_rows[0][0], "newer", limit=5)
+    get_purchases_page(purchase_rows[-1][0], "older", limit=1)
+    get_purchases_page(purchase_rows[0][0], "newer", limit=1)
+    get_users_page(giver, "next")
+    get_users_page(receiver, "prev")
+    _assert_indexed(traced)
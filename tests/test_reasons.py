@@ -0,0 +1,30 @@
+# -*- coding: utf-8 -*-
+
+import constants
+from db import get_connection, init_db
+from services.pluses import save_plus
+from services.users import add_user
+
+
+def test_init_db_syncs_reasons_with_constants(monkeypatch):
+    monkeypatch.setitem(constants.REASONS, "mentor", "За наставничество")
+    monkeypatch.setitem(constants.REASONS, "sport", "За спорт в офисе")
+    init_db()
+
+    giver = add_user("Причины Даритель")
+    receiver = add_user("Причины Получатель")
+    save_plus(giver, receiver, "mentor", None, None)
+
+    with get_connection() as conn:
+        c = conn.cursor()
+        c.execute("SELECT title FROM reasons WHERE key IN ('mentor', 'sport') ORDER BY key")
+        assert c.fetchall() == [("За наставничество",), ("За спорт в офисе",)]
+        c.execute(
+            "SELECT r.key FROM pluses p JOIN reasons r ON r.id = p.reason_id WHERE p.to_id = ?",
+            (receiver,),
+        )
+        assert c.fetchall() == [("mentor",)]
+
+    # Вернуть прежние названия для остальных тестов
+    monkeypatch.undo()
+    init_db()
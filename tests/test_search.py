@@ -0,0 +1,42 @@
+# -*- coding: utf-8 -*-
+
+import random
+
+from services.search import UserIndex, _fold
+
+FIRST = ["Иван", "Пётр", "Анна", "Алёна", "Ольга", "Алексей", "Иванна", "Сергей"]
+LAST = ["Иванов", "Петрова", "Ковалёв", "Смирнова", "Алексеев", "Шевченко", "Орлов"]
+
+
+def _brute_force(names: dict[int, str], query: str, limit: int, exclude_id=None):
+    q = _fold(query.strip())
+    ranked = []
+    for user_id, name in names.items():
+        folded = _fold(name)
+        if user_id == exclude_id:
+            continue
+        if folded.startswith(q):
+            rank = 0
+        elif any(word.startswith(q) for word in folded.split()):
+            rank = 1
+        elif len(q) >= 3 and q in folded:
+            rank = 2
+        else:
+            continue
+        ranked.append((rank, folded, user_id, name))
+    return [(user_id, name) for _, _, user_id, name in sorted(ranked)[:limit]]
+
+
+def test_search_matches_full_ranking():
+    rng = random.Random(1)
+    names = {user_id: f"{rng.choice(FIRST)} {rng.choice(LAST)}" for user_id in range(300)}
+    index = UserIndex()
+    for user_id, name in names.items():
+        index.add(user_id, name)
+    index.remove(7)
+    del names[7]
+
+    for query in ["и", "ал", "ова", "иван", "ев", "ЁВ", "петрова ", "анна смир", "енко", "нет"]:
+        for limit in (1, 10, 500):
+            assert index.search(query, limit=limit) == _brute_force(names, query, limit), (query, limit)
+    assert index.search("иван", exclude_id=0) == _brute_force(names, "иван", 10, exclude_id=0)
@@ -0,0 +1,86 @@
+# -*- coding: utf-8 -*-
+
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from types import SimpleNamespace
+from unittest.mock import AsyncMock
+
+import rendering
+import services.shop as shop
+from constants import DEFAULT_CATALOG
+from db import get_connection
+from handlers import callbacks
+from services.pluses import save_pluses
+from services.shop import add_item, buy_item, remove_item
+from services.users import add_user
+
+ATTEMPTS = 300
+
+
+def test_concurrent_buys_never_oversell_or_overspend():
+    _, price, limit = DEFAULT_CATALOG["mug"]
+    with get_connection() as conn:
+        assert conn.execute("SELECT sold_count FROM shop_items WHERE item_key = 'mug'").fetchone() == (0,)
+
+    giver = add_user("Стресс Даритель")
+    buyer = add_user("Стресс Покупатель")
+    received = ATTEMPTS * price
+    save_pluses([(giver, buyer, "other", "стресс", None)] * received)
+
+    with ThreadPoolExecutor(max_workers=32) as pool:
+        results = list(pool.map(lambda _: buy_item(buyer, "mug"), range(ATTEMPTS)))
+
+    assert sum(ok for ok, _ in results) == limit
+    with get_connection() as conn:
+        c = conn.cursor()
+        c.execute("SELECT sold_count FROM shop_items WHERE item_key = 'mug'")
+        assert c.fetchone() == (limit,)
+        c.execute("SELECT COUNT(*) FROM purchases WHERE item_key = 'mug'")
+        assert c.fetchone() == (limit,)
+        c.execute("SELECT received, received - spent FROM balances WHERE user_id = ?", (buyer,))
+        assert c.fetchone() == (received, received - limit * price)
+
+
+def _callback(internal_id: int):
+    message = SimpleNamespace(chat_id=internal_id, reply_text=AsyncMock())
+    query = SimpleNamespace(from_user=SimpleNamespace(id=internal_id), message=message)
+    context = SimpleNamespace(user_data={"internal_id": internal_id})
+    return SimpleNamespace(callback_query=query), context
+
+
+def test_catalog_screens_query_count_is_flat(traced, monkeypatch):
+    monkeypatch.setattr(rendering, "_limiter", rendering.ChatRateLimiter(0))
+    admin = add_user("Каталог Админ", is_admin_flag=True)
+    update, context = _callback(admin)
+    screens = (callbacks.shop, callbacks.admin_items)
+
+    async def render(handler):
+        # Холодный кэш каталога и баланса — считаются все запросы экрана
+        shop.invalidate_catalog()
+        shop._balance_cache.invalidate(admin)
+        traced.clear()
+        await handler(update, context, None)
+        return sum(sql.lstrip().upper().startswith("SELECT") for sql in traced)
+
+    added = []
+    selects = {}
+    try:
+        for size in (5, 50, 150):
+            while len(shop.get_catalog_snapshot()) < size:
+                key = f"item_{len(added):03d}"
+                add_item(key, f"Товар {key}", 1, 10 if len(added) % 2 else None)
+                added.append(key)
+            for handler in screens:
+                asyncio.run(render(handler))  # прогрев кэша пользователей
+                selects[size, handler.__name__] = asyncio.run(render(handler))
+    finally:
+        for key in added:
+            remove_item(key)
+
+    for handler in screens:
+        counts = {selects[size, handler.__name__] for size in (5, 50, 150)}
+        assert len(counts) == 1, (handler.__name__, selects)
+    assert selects[150, "shop"] == 2
+    assert selects[150, "admin_items"] == 1
+    sent = "".join(call.args[0] for call in update.callback_query.message.reply_text.await_args_list)
+    assert "item_145" in sent
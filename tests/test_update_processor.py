@@ -0,0 +1,57 @@
+# -*- coding: utf-8 -*-
+
+import asyncio
+import random
+from collections import defaultdict
+from datetime import datetime
+
+from telegram import Chat, Message, Update, User
+
+from update_processor import PerUserUpdateProcessor
+
+USERS = 50
+UPDATES = 5000
+MAX_RUNNING = 8
+
+
+def _update(update_id: int, user_id: int) -> Update:
+    return Update(
+        update_id,
+        message=Message(
+            update_id,
+            datetime.now(),
+            Chat(user_id, Chat.PRIVATE),
+            from_user=User(user_id, "Test", False),
+            text="x",
+        ),
+    )
+
+
+def test_replay_keeps_per_user_order_and_bounds_concurrency():
+    rng = random.Random(1)
+    updates = [_update(i, rng.randrange(USERS)) for i in range(UPDATES)]
+    seen = defaultdict(list)
+    running = 0
+    peak = 0
+
+    async def handle(update: Update):
+        nonlocal running, peak
+        running += 1
+        peak = max(peak, running)
+        seen[update.effective_user.id].append(update.update_id)
+        for _ in range(rng.randrange(3)):
+            await asyncio.sleep(0)
+        running -= 1
+
+    async def replay():
+        processor = PerUserUpdateProcessor(max_running=MAX_RUNNING)
+        await asyncio.gather(*(processor.process_update(u, handle(u)) for u in updates))
+        return processor
+
+    processor = asyncio.run(replay())
+
+    assert sum(map(len, seen.values())) == UPDATES
+    for ids in seen.values():
+        assert ids == sorted(ids)
+    assert peak == MAX_RUNNING
+    assert processor._locks == {}
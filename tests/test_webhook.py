@@ -0,0 +1,72 @@
+# -*- coding: utf-8 -*-
+
+import asyncio
+
+from aiohttp.test_utils import TestClient, TestServer
+from telegram import Update
+from telegram.ext import ApplicationBuilder
+
+from webhook import SECRET_HEADER, build_webhook_app
+
+SECRET = "s3cret"
+
+# Обновление в том виде, в каком его присылает Telegram
+RECORDED_UPDATE = {
+    "update_id": 100,
+    "message": {
+        "message_id": 5,
+        "date": 1700000000,
+        "chat": {"id": 42, "type": "private", "first_name": "Test"},
+        "from": {"id": 42, "is_bot": False, "first_name": "Test"},
+        "text": "/start",
+    },
+}
+
+
+def _run(scenario):
+    async def run():
+        application = ApplicationBuilder().token("123:TEST").build()
+        async with TestClient(TestServer(build_webhook_app(application, "hook", SECRET))) as client:
+            await scenario(application, client)
+
+    asyncio.run(run())
+
+
+def test_wrong_secret_is_rejected():
+    async def scenario(application, client):
+        response = await client.post("/hook", json=RECORDED_UPDATE, headers={SECRET_HEADER: "wrong"})
+        assert response.status == 403
+        assert application.update_queue.empty()
+
+    _run(scenario)
+
+
+def test_malformed_body_is_rejected():
+    async def scenario(application, client):
+        for body in ("not json", "[1, 2]", "{}", '{"update_id": "x", "message": 1}'):
+            response = await client.post("/hook", data=body, headers={SECRET_HEADER: SECRET})
+            assert response.status == 400, body
+        assert application.update_queue.empty()
+
+    _run(scenario)
+
+
+def test_recorded_update_is_queued():
+    async def scenario(application, client):
+        response = await client.post("/hook", json=RECORDED_UPDATE, headers={SECRET_HEADER: SECRET})
+        assert response.status == 200
+        update = application.update_queue.get_nowait()
+        assert isinstance(update, Update)
+        assert update.update_id == 100
+        assert update.effective_user.id == 42
+
+    _run(scenario)
+
+
+def test_health_before_start():
+    async def scenario(application, client):
+        response = await client.get("/healthz")
+        assert response.status == 503
+        assert await response.json() == {"status": "stopped"}
+
+    _run(scenario)
@@ -1,28 +1,30 @@
 # -*- coding: utf-8 -*-
 
 from telegram import InlineKeyboardButton, InlineKeyboardMarkup
+
+from cache import TTLCache
+from config import CACHE_TTL
 from constants import REASONS
+from services.users import get_users_page, users_version
 
 PAGE_SIZE = 10
+# Сколько отрисованных страниц списка пользователей держать в памяти
+PAGE_MARKUP_CACHE_SIZE = 256
 
 
 def build_users_pagination(
-    users: list[tuple[int, str]],
-    page: int,
+    page: tuple[list[tuple[int, str]], bool, bool],
     action: str,
     show_back_to_menu: bool = False,
 ):
     """
-    users: [(tg_id, name), ...]
-    page: номер страницы (0-based)
-    action: 'select_self' | 'choose_user'
-    """
+    page: ([(user_id, name), ...], has_prev, has_next) из services.users.get_users_page
+    action: 'select_self' | 'choose_user' | 'delete_user'
 
-    total = len(users)
-    start = page * PAGE_SIZE
-    end = start + PAGE_SIZE
+    Навигация — keyset-курсоры: {action}:prev:<id первого>, {action}:next:<id последнего>
+    """
 
-    page_users = users[start:end]
+    page_users, has_prev, has_next = page
 
     keyboard = []
 
@@ -35,14 +37,14 @@ def build_users_pagination(
     # ===== Навигация =====
     nav = []
 
-    if page > 0:
+    if has_prev and page_users:
         nav.append(
-            InlineKeyboardButton("⬅️ Назад", callback_data=f"{action}:page:{page - 1}")
+            InlineKeyboardButton("⬅️ Назад", callback_data=f"{action}:prev:{page_users[0][0]}")
         )
 
-    if end < total:
+    if has_next and page_users:
         nav.append(
-            InlineKeyboardButton("➡️ Далее", callback_data=f"{action}:page:{page + 1}")
+            InlineKeyboardButton("➡️ Далее", callback_data=f"{action}:next:{page_users[-1][0]}")
         )
 
     if nav:
@@ -57,37 +59,144 @@ def build_users_pagination(
     return InlineKeyboardMarkup(keyboard)
 
 
+def build_cursor_pagination(
+    action: str,
+    first_id: int | None,
+    last_id: int | None,
+    has_newer: bool,
+    has_older: bool,
+):
+    """
+    Навигация по ленте от новых к старым: {action}:newer:<first_id> / {action}:older:<last_id>
+    action: 'admin_view_pluses' | 'admin_view_purchases' | 'status'
+    """
+    nav = []
+    if has_newer and first_id is not None:
+        nav.append(InlineKeyboardButton("⬅️ Новее", callback_data=f"{action}:newer:{first_id}"))
+    if has_older and last_id is not None:
+        nav.append(InlineKeyboardButton("Старее ➡️", callback_data=f"{action}:older:{last_id}"))
+
+    keyboard = [nav] if nav else []
+    keyboard.append([InlineKeyboardButton("🏠 Главное меню", callback_data="back")])
+    return InlineKeyboardMarkup(keyboard)
+
+
+def build_history_pagination(page: tuple[list[tuple], bool, bool], action: str):
+    """page: ([(id, ...), ...], has_newer, has_older), строки от новых к старым"""
+    rows, has_newer, has_older = page
+    return build_cursor_pagination(
+        action,
+        rows[0][0] if rows else None,
+        rows[-1][0] if rows else None,
+        has_newer,
+        has_older,
+    )
+
+
+# ===== Статические клавиатуры =====
+# Объекты PTB неизменяемы, поэтому меню собираются один раз при импорте
+# и одни и те же экземпляры отдаются во все ответы.
+
+_USER_ROWS = (
+    (InlineKeyboardButton("➕ Поставить плюсик", callback_data="give_plus"),),
+    (InlineKeyboardButton("🛍️ Магазин", callback_data="shop"),),
+    (InlineKeyboardButton("📦 Мои покупки", callback_data="purchases"),),
+    (InlineKeyboardButton("📜 Моя история", callback_data="given_history"),),
+    (InlineKeyboardButton("📊 Мой статус", callback_data="status"),),
+)
+
+MAIN_MENU = InlineKeyboardMarkup(_USER_ROWS)
+
+ADMIN_MENU = InlineKeyboardMarkup(_USER_ROWS + (
+    (InlineKeyboardButton("👤 Добавить пользователя", callback_data="admin_add_user"),),
+    (InlineKeyboardButton("👥 Удалить пользователя", callback_data="admin_delete_user"),),
+    (InlineKeyboardButton("➕ Добавить товар", callback_data="admin_add_item"),),
+    (InlineKeyboardButton("🗑️ Удалить товар", callback_data="admin_items"),),
+    (InlineKeyboardButton("📑 Все плюсики", callback_data="admin_view_pluses"),),
+    (InlineKeyboardButton("💳 Все покупки", callback_data="admin_view_purchases"),),
+    (InlineKeyboardButton("📤 Выгрузка CSV", callback_data="admin_export"),),
+    (InlineKeyboardButton("🏆 Топ месяца", callback_data="admin_top"),),
+    (InlineKeyboardButton("📈 Аналитика", callback_data="admin_analytics"),),
+))
+
+REASONS_KEYBOARD = InlineKeyboardMarkup(
+    [[InlineKeyboardButton(text, callback_data=f"reason:{key}")] for key, text in REASONS.items()]
+    + [[InlineKeyboardButton("⬅️ Назад", callback_data="back")]]
+)
+
+COMMENT_KEYBOARD = InlineKeyboardMarkup([
+    [InlineKeyboardButton("✍️ Добавить комментарий", callback_data="add_comment")],
+    [InlineKeyboardButton("⏭ Пропустить", callback_data="skip_comment")],
+])
+
+BACK_KEYBOARD = InlineKeyboardMarkup([[InlineKeyboardButton("⬅️ Назад", callback_data="back")]])
+
+
 def main_menu():
-    return InlineKeyboardMarkup([
-        [InlineKeyboardButton("➕ Поставить плюсик", callback_data="give_plus")],
-        [InlineKeyboardButton("🛍️ Магазин", callback_data="shop")],
-        [InlineKeyboardButton("📦 Мои покупки", callback_data="purchases")],
-        [InlineKeyboardButton("📜 Моя история", callback_data="given_history")],
-        [InlineKeyboardButton("📊 Мой статус", callback_data="status")],
-    ])
+    return MAIN_MENU
 
 
 def admin_menu():
     """Menu for administrators only."""
-    return InlineKeyboardMarkup([
-        [InlineKeyboardButton("➕ Поставить плюсик", callback_data="give_plus")],
-        [InlineKeyboardButton("🛍️ Магазин", callback_data="shop")],
-        [InlineKeyboardButton("📦 Мои покупки", callback_data="purchases")],
-        [InlineKeyboardButton("📜 Моя история", callback_data="given_history")],
-        [InlineKeyboardButton("📊 Мой статус", callback_data="status")],
-        [InlineKeyboardButton("👤 Добавить пользователя", callback_data="admin_add_user")],
-        [InlineKeyboardButton("👥 Удалить пользователя", callback_data="admin_delete_user")],
-        [InlineKeyboardButton("➕ Добавить товар", callback_data="admin_add_item")],
-        [InlineKeyboardButton("🗑️ Удалить товар", callback_data="admin_items")],
-        [InlineKeyboardButton("📑 Все плюсики", callback_data="admin_view_pluses")],
-        [InlineKeyboardButton("💳 Все покупки", callback_data="admin_view_purchases")],
-    ])
+    return ADMIN_MENU
 
 
 def reasons_keyboard():
+    return REASONS_KEYBOARD
+
+
+def comment_keyboard():
+    """Choice between adding a comment and skipping it, after a reason is picked."""
+    return COMMENT_KEYBOARD
+
+
+def back_keyboard():
+    return BACK_KEYBOARD
+
+
+def build_top_keyboard(month: str, prev_month: str, next_month: str | None, reason_key: str | None):
+    """
+    Экран топа: выбор причины и соседних месяцев, кнопки top:<YYYY-MM>:<key|all>
+    next_month = None, если это текущий месяц
+    """
+    selected = reason_key or "all"
     keyboard = [
-        [InlineKeyboardButton(text, callback_data=f"reason:{key}")]
-        for key, text in REASONS.items()
+        [InlineKeyboardButton(("• " if key == selected else "") + text, callback_data=f"top:{month}:{key}")]
+        for key, text in (("all", "Все причины"), *REASONS.items())
     ]
-    keyboard.append([InlineKeyboardButton("⬅️ Назад", callback_data="back")])
+
+    nav = [InlineKeyboardButton(f"⬅️ {prev_month}", callback_data=f"top:{prev_month}:{selected}")]
+    if next_month is not None:
+        nav.append(InlineKeyboardButton(f"{next_month} ➡️", callback_data=f"top:{next_month}:{selected}"))
+    keyboard.append(nav)
+    keyboard.append([InlineKeyboardButton("🏠 Главное меню", callback_data="back")])
     return InlineKeyboardMarkup(keyboard)
+
+
+# ===== Страницы списка пользователей =====
+# (action, cursor_id, direction, exclude_id, show_back_to_menu, версия списка)
+# -> клавиатура страницы или None, если страница пуста. После добавления или
+# удаления пользователя версия меняется и старые страницы больше не находятся.
+_page_markups = TTLCache(PAGE_MARKUP_CACHE_SIZE, CACHE_TTL)
+
+
+def users_page_markup(
+    action: str,
+    cursor_id: int | None = None,
+    direction: str = "next",
+    exclude_id: int | None = None,
+    show_back_to_menu: bool = False,
+):
+    """Keyboard for one page of users (see build_users_pagination), or None if it is empty.
+
+    Blocking on a cache miss (reads the page from the DB): call via run_db.
+    """
+    key = (action, cursor_id, direction, exclude_id, show_back_to_menu, users_version())
+
+    def build():
+        page = get_users_page(cursor_id, direction, exclude_id=exclude_id, limit=PAGE_SIZE)
+        if not page[0]:
+            return None
+        return build_users_pagination(page=page, action=action, show_back_to_menu=show_back_to_menu)
+
+    return _page_markups.get_or_load(key, build)
@@ -0,0 +1,61 @@
+# -*- coding: utf-8 -*-
+
+import asyncio
+
+from telegram import Update
+from telegram.ext import BaseUpdateProcessor
+
+
+class PerUserUpdateProcessor(BaseUpdateProcessor):
+    """Process updates of different users concurrently, one user at a time.
+
+    Multi-step flows keep their state in `context.user_data` (plus_to,
+    pending_reason, awaiting_* flags), so two updates of the same user must
+    never interleave. Each user gets a FIFO lock; at most `max_running`
+    handlers run at once across all users.
+
+    The base class semaphore only bounds how many updates may be waiting
+    (`max_pending`). Updates queued behind their own user's lock don't
+    take a running slot, so one user's burst can't stall everyone else.
+    """
+
+    def __init__(self, max_running: int, max_pending: int = 1024):
+        super().__init__(max(max_pending, max_running))
+        self._running = asyncio.BoundedSemaphore(max_running)
+        # key -> [lock, number of updates holding or waiting for it]
+        self._locks = {}
+
+    @staticmethod
+    def _key(update: object):
+        if isinstance(update, Update):
+            if update.effective_user:
+                return update.effective_user.id
+            if update.effective_chat:
+                return update.effective_chat.id
+        return None
+
+    async def do_process_update(self, update: object, coroutine):
+        key = self._key(update)
+        if key is None:
+            async with self._running:
+                await coroutine
+            return
+
+        entry = self._locks.get(key)
+        if entry is None:
+            entry = self._locks[key] = [asyncio.Lock(), 0]
+        entry[1] += 1
+        try:
+            async with entry[0]:
+                async with self._running:
+                    await coroutine
+        finally:
+            entry[1] -= 1
+            if entry[1] == 0:
+                del self._locks[key]
+
+    async def initialize(self):
+        pass
+
+    async def shutdown(self):
+        pass
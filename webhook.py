@@ -0,0 +1,86 @@
+# -*- coding: utf-8 -*-
+
+import asyncio
+import hmac
+import signal
+
+from aiohttp import web
+from telegram import Update
+from telegram.ext import Application
+
+from config import WEBHOOK_URL, WEBHOOK_LISTEN, WEBHOOK_PORT, WEBHOOK_PATH, WEBHOOK_SECRET
+
+SECRET_HEADER = "X-Telegram-Bot-Api-Secret-Token"
+
+
+def build_webhook_app(application: Application, path: str = WEBHOOK_PATH, secret: str = WEBHOOK_SECRET) -> web.Application:
+    """HTTP app that feeds Telegram webhook POSTs into `application.update_queue`.
+
+    - POST /<path> — update JSON from Telegram, checked against `secret`;
+      403 on a wrong secret, 400 if the body is not an update object
+    - GET /healthz — 200 while the bot application is running, 503 otherwise
+    """
+
+    async def handle_update(request: web.Request) -> web.Response:
+        token = request.headers.get(SECRET_HEADER, "")
+        if not hmac.compare_digest(token.encode(), secret.encode()):
+            return web.Response(status=403)
+        try:
+            data = await request.json()
+            # Валидный JSON, но не объект update ([1, 2], {}, ...), — тоже 400
+            update = Update.de_json(data, application.bot) if isinstance(data, dict) else None
+        except (ValueError, KeyError, TypeError, AttributeError):
+            update = None
+        if update is None:
+            return web.Response(status=400)
+        await application.update_queue.put(update)
+        return web.Response()
+
+    async def health(request: web.Request) -> web.Response:
+        if not application.running:
+            return web.json_response({"status": "stopped"}, status=503)
+        return web.json_response({"status": "ok"})
+
+    app = web.Application()
+    app.router.add_post(f"/{path.strip('/')}", handle_update)
+    app.router.add_get("/healthz", health)
+    return app
+
+
+async def run_webhook(application: Application):
+    """Run the bot behind the local webhook server until SIGINT/SIGTERM.
+
+    Mirrors what Application.run_polling does around the update source:
+    initialize, post_init, start ... stop, shutdown, post_shutdown.
+    """
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, stop.set)
+
+    await application.initialize()
+    if application.post_init:
+        await application.post_init(application)
+    if WEBHOOK_URL:
+        await application.bot.set_webhook(
+            url=f"{WEBHOOK_URL.rstrip('/')}/{WEBHOOK_PATH.strip('/')}",
+            secret_token=WEBHOOK_SECRET,
+            allowed_updates=Update.ALL_TYPES,
+        )
+    await application.start()
+
+    runner = web.AppRunner(build_webhook_app(application))
+    await runner.setup()
+    await web.TCPSite(runner, WEBHOOK_LISTEN, WEBHOOK_PORT).start()
+    print(f"=== WEBHOOK LISTENING ON {WEBHOOK_LISTEN}:{WEBHOOK_PORT}/{WEBHOOK_PATH.strip('/')} ===")
+
+    try:
+        await stop.wait()
+    finally:
+        await runner.cleanup()
+        await application.stop()
+        if application.post_stop:
+            await application.post_stop(application)
+        await application.shutdown()
+        if application.post_shutdown:
+            await application.post_shutdown(application)